@@ -0,0 +1,100 @@
+"""Runs a mission over a whole stack of recorded frames at once.
+
+The yellow line masks, centroids and steering errors of every view1 are
+computed together in vectorised form. The stateful part of the mission,
+sign recognition, traffic lights, pedestrians and the control decision,
+then runs frame by frame over those precomputed lane results.
+"""
+import cv2
+import numpy as np
+
+import debug_writer
+from offline_services import StateHolder
+from stages import color_dist
+
+# lane_features()[variant], by whether the right yellow line is hidden
+FULL_WIDTH, RIGHT_HIDDEN = 0, 1
+
+def lane_features(lane, views1, chunk=1024):
+    """Lane moments of N stacked view1 frames.
+
+    Returns a dict of (2, N) arrays 'm00', 'm10', 'm01', 'cx', 'cy' and
+    'err', indexed by FULL_WIDTH and RIGHT_HIDDEN (id_num 34/35) first.
+    cx, cy and err follow LaneStage.follow and are 0 where m00 is 0.
+    Frames are processed `chunk` at a time to bound memory.
+    """
+    n, h, w, d = views1.shape
+    features = {key: np.zeros((2, n)) for key in ('m00', 'm10', 'm01', 'cx', 'cy', 'err')}
+    # the full width bands contain the right hidden ones, threshold those
+    # once and cut each variant's columns out of them
+    bands = [band for band in lane.bands(h, w, None) if band[1] > band[0] and band[2] > 0]
+    variants = ((FULL_WIDTH, lane.bands(h, w, None)), (RIGHT_HIDDEN, lane.bands(h, w, 34)))
+
+    for start in range(0, n, chunk):
+        views = views1[start:start + chunk]
+        k = len(views)
+        for y_start, y_end, x_end in bands:
+            # one tall image of the band of every frame, converted at once
+            rows = np.ascontiguousarray(views[:, y_start:y_end, :x_end]).reshape(-1, x_end, d)
+            hsv = cv2.cvtColor(rows, cv2.COLOR_BGR2HSV)
+            mask = cv2.inRange(hsv, color_dist['Yellow']['Lower'], color_dist['Yellow']['Upper'])
+            mask = (mask > 0).reshape(k, y_end - y_start, x_end)
+
+            for variant, variant_bands in variants:
+                for v_start, v_end, v_x_end in variant_bands:
+                    if (v_start, v_end) != (y_start, y_end) or v_x_end <= 0:
+                        continue
+                    band = mask[:, :, :v_x_end]
+                    per_column = band.sum(axis=1)
+                    per_row = band.sum(axis=2)
+                    features['m00'][variant, start:start + k] += per_column.sum(axis=1)
+                    features['m10'][variant, start:start + k] += per_column @ np.arange(v_x_end)
+                    features['m01'][variant, start:start + k] += per_row @ np.arange(y_start, y_end)
+
+    m00 = features['m00']
+    seen = m00 > 0
+    cx = np.zeros_like(m00)
+    cx[seen] = np.trunc(np.trunc(features['m10'][seen] / m00[seen]) + 108 / 2)
+    features['cx'] = cx
+    features['cy'][seen] = np.trunc(features['m01'][seen] / m00[seen])
+    features['err'] = np.where(seen, cx - w / 2, 0)
+    return features
+
+def image_to_speed_batch(mission, views1, views2=None, state=None, debug_dumps=False):
+    """image_to_speed over N frames.
+
+    views1 and views2 are stacked (N, h, w, 3) arrays; views2 may be None.
+    `state` is the state holder to continue from, a fresh one by default.
+    Returns the left and right wheel speeds as two length N arrays. The
+    input arrays are not modified. The debug images are only written with
+    `debug_dumps`, otherwise debug_writer is off until the batch is done.
+    """
+    if state is None:
+        state = StateHolder()
+    n = len(views1)
+    left = np.zeros(n)
+    right = np.zeros(n)
+
+    features = lane_features(mission.stage('lane'), views1) if mission.uses('lane') else None
+
+    enabled = debug_writer.config['enabled']
+    debug_writer.configure(enabled=enabled and debug_dumps)
+    try:
+        for i in range(n):
+            view1 = views1[i].copy()
+            view2 = None if views2 is None else views2[i].copy()
+            detect_lane = None
+            if features is not None:
+                detect_lane = _precomputed(features, i)
+            left[i], right[i] = mission.image_to_speed(view1, view2, state, detect_lane)
+    finally:
+        debug_writer.configure(enabled=enabled)
+    return left, right
+
+def _precomputed(features, i):
+    def detect(view, car, ctx=None):
+        variant = RIGHT_HIDDEN if car.id_num == 35 or car.id_num == 34 else FULL_WIDTH
+        if features['m00'][variant, i] > 0:
+            return True, {key: features[key][variant, i] for key in ('m00', 'm10', 'm01')}
+        return False, None
+    return detect
@@ -0,0 +1,188 @@
+"""Times every mission and its stages on synthetic drives against a stored
+baseline.
+
+    python benchmark.py --save              # store this machine's baseline
+    python benchmark.py                     # compare, exit 1 on a regression
+    python benchmark.py --tolerance 10 --missions parking_final
+
+Each mission replays a synthetic drive (see synthetic.py) that takes it
+through its states: lane following, the junction sign and light, the
+parking manoeuvre. The median time of image_to_speed and of every stage
+timing.py records is compared with the baseline, and a stage slower by
+more than --tolerance percent (and --min-ms) is a regression. Runs on the
+offline_services stand-ins unless --services is given.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+
+import cv2
+import numpy as np
+
+import offline_services
+import replay
+from synthetic import view1, view2
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+def lane_drive(n, rng):
+    """A winding lane, a straight-on sign passes by halfway."""
+    frames = []
+    for i in range(n):
+        curve = 0.004 * np.sin(i / 10)
+        sign = (420, 100, 60) if n // 3 <= i < 2 * n // 3 else None
+        frames.append((view1(x=26, curve=curve, noise=4, rng=rng),
+                       view2(sign=sign, noise=4, rng=rng)))
+    return frames, 35
+
+def junction_drive(n, rng):
+    """Lane following past a turn left sign up to a junction, red light
+    for a quarter of the drive, then green."""
+    frames = []
+    for i in range(n):
+        if i < n // 2:
+            frames.append((view1(x=26, curve=0.002, noise=4, rng=rng),
+                           view2(sign=(420, 100, 60), noise=4, rng=rng)))
+        else:
+            light = 'red' if i < 3 * n // 4 else 'green'
+            frames.append((view1(x=None, noise=4, rng=rng),
+                           view2(light=light, noise=4, rng=rng)))
+    return frames, 34
+
+def parking_drive(n, rng):
+    """The parking sign, then a sixth of the drive each: one white line,
+    both lines with the yellow line askew in view1, just the askew yellow
+    line, yellow floor behind the car, and finally nothing."""
+    left = ((120, 479), (200, 360))
+    right = ((420, 479), (500, 360))
+    askew = {'x': 40, 'slope': 0.5, 'bottom': 80}
+    # (view1, view2) options of each phase
+    phases = [
+        ({'x': None}, {'sign': (420, 100, 60)}),            # sign, no lines
+        ({'x': None}, {'white_lines': [left]}),             # left line
+        (askew, {'white_lines': [left, right]}),            # both lines
+        (askew, {}),                                        # align
+        ({'x': None}, {'yellow_from': 400}),                # reverse
+        ({'x': None}, {}),                                  # stop
+    ]
+    frames = []
+    for i in range(n):
+        v1, v2 = phases[i * len(phases) // n]
+        frames.append((view1(noise=4, rng=rng, **v1), view2(noise=4, rng=rng, **v2)))
+    return frames, 33
+
+SCENARIOS = {
+    'follow_line_final': lane_drive,
+    'parking_final': parking_drive,
+    'follow_line_trafficlight_final': junction_drive,
+    'follow_line_pedestrian_final': junction_drive,
+}
+
+def run_mission(name, frames=120, repeat=3, seed=0):
+    """{'<name>/image_to_speed': ms, '<name>/<stage>': ms, ...}, the median
+    over every frame of `repeat` runs of the mission's drive."""
+    import timing
+    from mission_engine import Mission
+
+    rng = np.random.default_rng(seed)
+    drive, sign_id = SCENARIOS[name](frames, rng)
+    offline_services.StandInSVM.sign_id = sign_id
+    stages = importlib.import_module(name).mission.stages
+
+    # one untimed run to warm up the models and caches
+    replay.replay(Mission(stages), drive)
+    timing.reset()
+    timing.config['window'] = frames * repeat
+    seconds = []
+    for _ in range(repeat):
+        mission = Mission(stages)
+        mission.warmup()
+        seconds += replay.replay(mission, drive)[0]
+
+    result = {name + '/image_to_speed': float(np.median(seconds)) * 1000}
+    for stage, stats in timing.report().items():
+        result[name + '/' + stage] = float(stats['p50'])
+    timing.reset()
+    return result
+
+def compare(current, baseline, tolerance=25.0, min_ms=0.05):
+    """Rows of (name, baseline ms, current ms, change %, status) and whether
+    anything regressed. A stage regresses when it is more than `tolerance`
+    percent and `min_ms` slower than its baseline."""
+    rows = []
+    regressed = False
+    for name in sorted(current):
+        now = current[name]
+        before = baseline.get(name)
+        if before is None:
+            rows.append((name, None, now, None, 'new'))
+            continue
+        change = (now - before) / before * 100 if before else 0.0
+        status = 'ok'
+        if change > tolerance and now - before > min_ms:
+            status = 'REGRESSED'
+            regressed = True
+        elif change < -tolerance and before - now > min_ms:
+            status = 'faster'
+        rows.append((name, before, now, change, status))
+    return rows, regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--missions', nargs='+', choices=replay.MISSIONS, default=replay.MISSIONS)
+    parser.add_argument('--baseline', default=BASELINE, help='baseline json file')
+    parser.add_argument('--save', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=25.0,
+                        help='percent slower than the baseline that counts as a regression')
+    parser.add_argument('--min-ms', type=float, default=0.05,
+                        help='ignore slowdowns smaller than this many milliseconds')
+    parser.add_argument('--frames', type=int, default=120, help='frames per synthetic drive')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of every drive')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the frame noise')
+    parser.add_argument('--services', action='store_true',
+                        help='use the real services modules if they are importable')
+    args = parser.parse_args(argv)
+
+    offline_services.install(force=not args.services)
+    import debug_writer
+    debug_writer.configure(enabled=False)
+    import timing
+    timing.config['enabled'] = True
+    timing.config['dump_at_exit'] = False
+    # stable numbers over raw speed
+    cv2.setNumThreads(1)
+
+    current = {}
+    for name in args.missions:
+        current.update(run_mission(name, args.frames, args.repeat, args.seed))
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': platform.node(), 'opencv': cv2.__version__,
+                       'frames': args.frames, 'results': current}, f, indent=2, sort_keys=True)
+        for name in sorted(current):
+            print('%-56s %9.3f ms' % (name, current[name]))
+        print('baseline written to %s' % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        parser.error('no baseline at %s, run with --save first' % args.baseline)
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    rows, regressed = compare(current, baseline, args.tolerance, args.min_ms)
+    print('%-56s %11s %11s %8s' % ('stage', 'baseline ms', 'now ms', 'change'))
+    for name, before, now, change, status in rows:
+        print('%-56s %11s %11.3f %8s  %s'
+              % (name, '-' if before is None else '%.3f' % before, now,
+                 '-' if change is None else '%+.1f%%' % change, status))
+    if regressed:
+        print('regression beyond %.0f%%' % args.tolerance)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+class CarState:
+    """The car's state between calls of image_to_speed.
+
+    Fields:
+        state:          frame counter, 1 on the first frame
+        id_num:         last recognised sign id, None until one is seen
+        current_speed:  speed of the faster wheel on the last frame
+        color_id:       0=red, 1=yellow, 2=green, 3=has_check_light
+        parking_state:  see stages.ParkingStage
+
+    image_to_speed loads it from the simulator's state holder once, updates
+    the fields directly and commits it back once at the end of the frame.
+    """
+    __slots__ = ('state', 'id_num', 'current_speed', 'color_id', 'parking_state')
+
+    def __init__(self, state=0, id_num=None, current_speed=0.5, color_id=None, parking_state=0):
+        self.state = state
+        self.id_num = id_num
+        self.current_speed = current_speed
+        self.color_id = color_id
+        self.parking_state = parking_state
+
+    @classmethod
+    def load(cls, holder):
+        """The CarState kept in `holder`, a new one when it is still None.
+        A plain dict with the same keys is converted."""
+        car = holder.get()
+        if car is None:
+            return cls()
+        if isinstance(car, dict):
+            return cls(**car)
+        return car
+
+    def commit(self, holder):
+        holder.set(self)
+
+    def snapshot(self):
+        return (self.state, self.id_num, self.current_speed, self.color_id, self.parking_state)
+
+    def restore(self, snapshot):
+        self.state, self.id_num, self.current_speed, self.color_id, self.parking_state = snapshot
+
+    def as_dict(self):
+        return dict(zip(self.__slots__, self.snapshot()))
+
+    def __repr__(self):
+        return 'CarState(%s)' % ', '.join('%s=%r' % item for item in self.as_dict().items())
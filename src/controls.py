@@ -0,0 +1,34 @@
+"""Wheel speed commands shared by every mission."""
+import event_log
+from event_log import EventLog
+
+# if you want print some log when your program is running,
+# just append a string to this variable, or record an event_log event
+log = EventLog(capacity=10000)
+
+def stop_fn(car, left_speed=0, right_speed=0):
+    log.event(event_log.STOPPING, left_speed, right_speed)
+    return left_speed, right_speed
+
+def turn_right_fn(car, left_speed, lr_ratio = 0.2):
+    right_speed = lr_ratio * left_speed
+    log.event(event_log.TURNING_RIGHT, left_speed, right_speed)
+    return left_speed, right_speed
+
+def turn_left_fn(car, right_speed, lr_ratio = 0.2):
+    left_speed = lr_ratio * right_speed
+    log.event(event_log.TURNING_LEFT, left_speed, right_speed)
+    return left_speed, right_speed
+
+def straight_fn(car, initial_speed):
+    if car.current_speed < 0.9:
+        initial_speed += 0.1
+        car.current_speed = initial_speed
+    left_speed = right_speed = car.current_speed
+    log.event(event_log.GOING_STRAIGHT, left_speed, right_speed)
+    return left_speed, right_speed
+
+def reverse_fn(car, speed=-0.2):
+    left_speed = right_speed = speed
+    log.event(event_log.GOING_STRAIGHT, left_speed, right_speed)
+    return left_speed, right_speed
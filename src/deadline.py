@@ -0,0 +1,109 @@
+"""Per-frame time budget for image_to_speed.
+
+    mission.deadline = DeadlineScheduler(budget_ms=40)
+
+Every stage the mission runs through the scheduler is timed, and a moving
+average of its cost is kept. At the start of a frame the costs of the
+stages that frame will run are added up, and while they exceed the budget
+the optional work is given up, in DEGRADATIONS order:
+
+    coarse_pedestrian   pedestrian HOG on a coarser pyramid and stride
+    skip_sign           keep the last sign id while the yellow line is seen
+    reuse_light         keep waiting on the last red/yellow light
+
+A degradation also fires mid-frame when the time already spent plus the
+stage's cost would overrun the budget. No degradation fires on more than
+`max_streak` frames in a row, so a blown budget never keeps the car
+waiting on a stale light for good. Lane following and the stop decisions
+always run. stats counts the frames, the frames that still went
+over budget and how often each degradation fired.
+"""
+import time
+
+DEGRADATIONS = ('coarse_pedestrian', 'skip_sign', 'reuse_light')
+# the stage each degradation saves on
+_SAVES = {
+    'coarse_pedestrian': 'pedestrian',
+    'skip_sign': 'sign',
+    'reuse_light': 'traffic_light',
+}
+
+class DeadlineScheduler:
+    def __init__(self, budget_ms=50.0, alpha=0.2, coarse_ratio=0.35, max_streak=3):
+        self.budget = budget_ms / 1000
+        self.alpha = alpha
+        self.coarse_ratio = coarse_ratio
+        self.max_streak = max_streak
+        self.cost = {}          # stage: moving average of its seconds
+        self.planned = set()
+        self.fired = set()
+        self.streak = dict.fromkeys(DEGRADATIONS, 0)
+        self.stats = dict.fromkeys(('frames', 'over_budget') + DEGRADATIONS, 0)
+        self._start = None
+
+    def predicted(self, stage, degraded=False):
+        if degraded:
+            if stage == 'pedestrian':
+                return self.cost.get('pedestrian:coarse', self.coarse_ratio * self.cost.get(stage, 0.0))
+            return 0.0
+        return self.cost.get(stage, 0.0)
+
+    def start(self, stages):
+        """Begin a frame that runs `stages`, and plan what to give up for the
+        predicted cost to fit in the budget."""
+        self._start = time.perf_counter()
+        self.stats['frames'] += 1
+        for name in DEGRADATIONS:
+            self.streak[name] = self.streak[name] + 1 if name in self.fired else 0
+        self.fired = set()
+        self.planned = set()
+        total = sum(self.predicted(stage) for stage in stages)
+        for name in DEGRADATIONS:
+            if total <= self.budget:
+                break
+            stage = _SAVES[name]
+            if stage in stages:
+                self.planned.add(name)
+                total -= self.predicted(stage) - self.predicted(stage, degraded=True)
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def degrade(self, name):
+        """Whether to give up `name` now. Counts it when it fires."""
+        if self.streak[name] >= self.max_streak:
+            return False
+        if name not in self.planned and \
+                self.elapsed() + self.predicted(_SAVES[name]) <= self.budget:
+            return False
+        self.fired.add(name)
+        self.stats[name] += 1
+        return True
+
+    def run(self, stage, fn, *args, degraded=False):
+        """fn(*args), timed as `stage`."""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            key = stage + ':coarse' if degraded and stage == 'pedestrian' else stage
+            seconds = time.perf_counter() - start
+            old = self.cost.get(key)
+            self.cost[key] = seconds if old is None else old + self.alpha * (seconds - old)
+
+    def finish(self):
+        if self.elapsed() > self.budget:
+            self.stats['over_budget'] += 1
+
+    def report(self):
+        """stats with the rate of every counter per frame."""
+        frames = max(self.stats['frames'], 1)
+        return {name: (count, count / frames) for name, count in self.stats.items()}
+
+    def reset(self):
+        self.cost.clear()
+        self.planned = set()
+        self.fired = set()
+        self.streak = dict.fromkeys(DEGRADATIONS, 0)
+        for name in self.stats:
+            self.stats[name] = 0
@@ -0,0 +1,91 @@
+import atexit
+import collections
+import threading
+
+from services.utils import imwrite as _imwrite
+
+# debug images are encoded and written by a background thread so that
+# image_to_speed never waits on JPEG encoding or disk I/O.
+#   enabled:      False turns every debug dump into a no-op
+#   policy:       'drop_oldest' queues every image, 'sample' keeps every image
+#                 of 1 in sample_every frames, a frame being the '<n>-' prefix
+#   capacity:     queue length, the oldest pending image is dropped when full
+config = {
+            'enabled': True,
+            'policy': 'drop_oldest',
+            'sample_every': 5,
+            'capacity': 64,
+              }
+stats = {'queued': 0, 'written': 0, 'dropped': 0, 'skipped': 0}
+
+_queue = collections.deque(maxlen=config['capacity'])
+_cond = threading.Condition()
+_frame = None
+_frames = 0
+_keep = True
+_busy = False
+_thread = None
+
+def configure(**kwargs):
+    global _queue
+    with _cond:
+        config.update(kwargs)
+        if _queue.maxlen != config['capacity']:
+            _queue = collections.deque(_queue, maxlen=config['capacity'])
+
+def _sampled(name):
+    """Whether the frame `name` belongs to is kept. Called with _cond held."""
+    global _frame, _frames, _keep
+    frame = name.split('-', 1)[0]
+    if frame != _frame:
+        _frame = frame
+        _frames += 1
+        _keep = (_frames - 1) % config['sample_every'] == 0
+    return _keep
+
+def imwrite(name, img):
+    if not config['enabled'] or img is None:
+        return
+    if config['policy'] == 'sample':
+        with _cond:
+            keep = _sampled(name)
+        if not keep:
+            stats['skipped'] += 1
+            return
+    # callers keep drawing on their views, so queue a snapshot
+    img = img.copy()
+    with _cond:
+        if len(_queue) == _queue.maxlen:
+            stats['dropped'] += 1
+        _queue.append((name, img))
+        stats['queued'] += 1
+        _start()
+        _cond.notify()
+
+def flush(timeout=None):
+    """Block until every queued image has been written."""
+    with _cond:
+        return _cond.wait_for(lambda: not _queue and not _busy, timeout)
+
+def _start():
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_run, name='debug_writer', daemon=True)
+        _thread.start()
+
+def _run():
+    global _busy
+    while True:
+        with _cond:
+            _busy = False
+            _cond.notify_all()
+            _cond.wait_for(lambda: _queue)
+            name, img = _queue.popleft()
+            _busy = True
+        try:
+            _imwrite(name, img)
+            stats['written'] += 1
+        except Exception:
+            stats['dropped'] += 1
+
+atexit.register(flush, 5.0)
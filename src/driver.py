@@ -0,0 +1,180 @@
+"""Drives a mission module from a live stream of frames, latest frame wins.
+
+    python driver.py follow_line_final recording/ --fps 30
+
+Frames arrive on the asyncio event loop and go into a one-frame mailbox:
+a frame that is not picked up before the next one arrives is dropped, so
+image_to_speed always gets the newest view instead of working through a
+backlog. image_to_speed runs on a worker thread, off the event loop, and
+the wheel speeds are published as soon as it returns. The loop counts the
+dropped frames and measures the age of every command, from the capture of
+its frame to publishing.
+
+LocalFrameSource plays recorded frames at a fixed camera rate, standing
+in for the simulator's camera.
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import importlib
+import inspect
+import sys
+import time
+
+import numpy as np
+
+import offline_services
+import replay
+
+Frame = collections.namedtuple('Frame', 'index captured view1 view2')
+
+class LatestFrame:
+    """One-frame mailbox. put() replaces a frame nobody took yet."""
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._ready = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._ready.set()
+
+    def close(self):
+        """No more frames; get() returns None once the last one was taken."""
+        self._closed = True
+        self._ready.set()
+
+    async def get(self):
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+class LocalFrameSource:
+    """Async iterator over recorded (view1, view2) pairs, one every 1/fps
+    seconds, each stamped with its capture time."""
+    def __init__(self, frames, fps=30.0):
+        self.frames = frames
+        self.period = 1.0 / fps
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        for i, (view1, view2) in enumerate(self.frames):
+            # sleep(0) still lets the control loop run between frames
+            await asyncio.sleep(max(0.0, start + i * self.period - time.perf_counter()))
+            # image_to_speed draws on its views, keep the recording intact
+            yield Frame(i, time.perf_counter(),
+                        None if view1 is None else view1.copy(),
+                        None if view2 is None else view2.copy())
+
+class ControlLoop:
+    """Runs `image_to_speed(view1, view2, state)` on the newest frame and
+    calls `publish(frame, (left, right))`, which may be a coroutine
+    function, with every result."""
+    def __init__(self, image_to_speed, publish=None, state=None):
+        self.image_to_speed = image_to_speed
+        self.publish = publish
+        self.state = state if state is not None else offline_services.StateHolder()
+        self.mailbox = None
+        self.commands = []
+        self.ages = []
+        self.seconds = []
+        # one frame at a time: the missions keep state between frames
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='perception')
+
+    async def feed(self, source):
+        async for frame in source:
+            self.mailbox.put(frame)
+        self.mailbox.close()
+
+    async def control(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            frame = await self.mailbox.get()
+            if frame is None:
+                return
+            start = time.perf_counter()
+            speeds = await loop.run_in_executor(self._executor, self.image_to_speed,
+                                                frame.view1, frame.view2, self.state)
+            done = time.perf_counter()
+            self.seconds.append(done - start)
+            self.ages.append(done - frame.captured)
+            self.commands.append((frame.index, speeds))
+            if self.publish is not None:
+                published = self.publish(frame, speeds)
+                if inspect.isawaitable(published):
+                    await published
+
+    async def run(self, source):
+        """Drive the mission until `source` runs out."""
+        self.mailbox = LatestFrame()
+        await asyncio.gather(self.feed(source), self.control())
+
+    def stats(self):
+        """Frame counts and command ages in milliseconds."""
+        ages = np.array(self.ages) * 1000
+        ms = np.array(self.seconds) * 1000
+        result = {
+            'received': self.mailbox.received if self.mailbox else 0,
+            'processed': len(self.commands),
+            'dropped': self.mailbox.dropped if self.mailbox else 0,
+        }
+        if len(ages):
+            result.update({
+                'age_p50': float(np.percentile(ages, 50)),
+                'age_p95': float(np.percentile(ages, 95)),
+                'age_max': float(ages.max()),
+                'perception_p50': float(np.percentile(ms, 50)),
+            })
+        return result
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mission', choices=replay.MISSIONS)
+    parser.add_argument('recording', help='frame directory, .rec or .npz file')
+    parser.add_argument('--fps', type=float, default=30.0, help='camera frame rate')
+    parser.add_argument('--sign', type=int, default=None,
+                        help='offline only: sign id the stand-in SVM reports for every detected sign')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the stand-in services even if the real ones are importable')
+    args = parser.parse_args(argv)
+
+    offline_services.install(sign_id=args.sign, force=args.offline)
+    import debug_writer
+    debug_writer.configure(enabled=False)
+    mission = importlib.import_module(args.mission)
+
+    frames = replay.load_frames(args.recording)
+    if not frames:
+        parser.error('no frames found in %s' % args.recording)
+
+    def publish(frame, speeds):
+        mission.log.clear()
+        print('%d l:%.2f r:%.2f' % (frame.index + 1, speeds[0], speeds[1]))
+
+    control = ControlLoop(mission.image_to_speed, publish)
+    try:
+        asyncio.run(control.run(LocalFrameSource(frames, args.fps)))
+    finally:
+        control.close()
+    s = control.stats()
+    print('%d frames received, %d processed, %d dropped' % (s['received'], s['processed'], s['dropped']))
+    if s['processed']:
+        print('command age p50 %.2f ms, p95 %.2f ms, max %.2f ms, perception p50 %.2f ms'
+              % (s['age_p50'], s['age_p95'], s['age_max'], s['perception_p50']))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Bounded log of structured events.
+
+The mission modules record an event code plus its raw fields, and the text
+is only formatted when somebody reads the log. The log keeps the last
+`capacity` events, so its memory stays flat however long the car runs.
+"""
+import collections
+
+FORMATS = []
+
+def _event(fmt):
+    FORMATS.append(fmt)
+    return len(FORMATS) - 1
+
+TEXT = _event("%s")
+FRAME = _event("#%d")
+STOPPING = _event("stopping, l:%.2f, r:%.2f")
+TURNING_RIGHT = _event("turning right, l:%.2f, r:%.2f")
+TURNING_LEFT = _event("turning left, l:%.2f, r:%.2f")
+GOING_STRAIGHT = _event("going straight, l:%.2f, r:%.2f")
+FINDING_CARPARK = _event("finding carpark, l:%.2f, r:%.2f")
+ERR = _event("err: %d")
+SIGN_ID = _event("id:%s")
+LIGHT = _event("%d-%s light")
+PEDESTRIAN = _event("pedestrian detected")
+PARKING_STATE = _event("parking_state: %s")
+SLOPE = _event("slope: %s")
+
+# code: constant name, e.g. 'STOPPING'
+NAMES = {code: name for name, code in list(globals().items())
+         if name.isupper() and isinstance(code, int)}
+
+def format_event(code, fields):
+    return FORMATS[code] % fields
+
+class EventLog:
+    """Ring buffer of (code, fields) events.
+
+    Reading it, by iterating, indexing or drain(), yields formatted strings,
+    so it can stand in for the plain list of strings the simulator reads.
+    """
+    def __init__(self, capacity=10000):
+        self._events = collections.deque(maxlen=capacity)
+        self.dropped = 0
+
+    @property
+    def capacity(self):
+        return self._events.maxlen
+
+    def event(self, code, *fields):
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append((code, fields))
+
+    def append(self, text):
+        """Free text entry, as with the old list log."""
+        self.event(TEXT, text)
+
+    def events(self):
+        """The raw (code, fields) pairs, oldest first."""
+        return list(self._events)
+
+    def drain(self):
+        """Formatted text of every event, oldest first, and empty the log."""
+        events = self._events
+        lines = []
+        while events:
+            lines.append(format_event(*events.popleft()))
+        return lines
+
+    def clear(self):
+        self._events.clear()
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        return (format_event(code, fields) for code, fields in list(self._events))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [format_event(*e) for e in list(self._events)[index]]
+        return format_event(*self._events[index])
+
+    def __delitem__(self, index):
+        if index != slice(None):
+            raise TypeError("only the whole log can be deleted")
+        self.clear()
@@ -0,0 +1,109 @@
+"""Replay many recorded drives in parallel, one car session per recording.
+
+    python fleet.py follow_line_pedestrian_final drives/*.npz --processes 8
+
+Each session gets its own car state and stages. The log is the
+process-wide controls.log, but a worker runs one session at a time and
+clears it first, so it only holds that session's events; the summary
+counts them by code. The sign detector, SVM and pedestrian HOG are loaded
+once in the parent before the pool is forked, so the workers share them
+copy-on-write instead of loading their own. Recordings use the formats
+replay.py reads.
+"""
+import argparse
+import collections
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import event_log
+import offline_services
+import replay
+
+# set in the parent before forking, inherited by the workers
+_mission_stages = None
+
+def _init_worker():
+    # the pool already uses every core, keep OpenCV to one thread per worker
+    cv2.setNumThreads(1)
+
+def run_session(path):
+    """Replay one recording with a fresh mission. Returns its summary."""
+    from mission_engine import Mission
+    mission = Mission(_mission_stages)
+    mission.warmup()
+    mission.log.clear()
+
+    start = time.perf_counter()
+    frames = replay.load_frames(path)
+    state = offline_services.StateHolder()
+    events = collections.Counter()
+    seconds, speeds = replay.replay(mission, frames, state, events)
+    ms = np.array(seconds) * 1000
+    speeds = np.array(speeds, dtype=float).reshape(-1, 2)
+    car = state.get()
+    return {
+        'recording': path,
+        'frames': len(frames),
+        'fps': len(ms) / (ms.sum() / 1000) if len(ms) else 0.0,
+        'mean_ms': float(ms.mean()) if len(ms) else 0.0,
+        'p95_ms': float(np.percentile(ms, 95)) if len(ms) else 0.0,
+        'stopped_frames': int(np.count_nonzero(speeds.max(axis=1) == 0)) if len(speeds) else 0,
+        'final_state': car.as_dict() if car is not None else None,
+        'events': {event_log.NAMES[code].lower(): n for code, n in sorted(events.items())},
+        'wall_s': time.perf_counter() - start,
+    }
+
+def run_fleet(mission_name, recordings, processes=None):
+    """Summaries of every recording, replayed across a process pool."""
+    global _mission_stages
+    # importing the mission warms every model it needs, in this process
+    module = importlib.import_module(mission_name)
+    _mission_stages = module.mission.stages
+
+    context = multiprocessing.get_context('fork')
+    with context.Pool(processes or os.cpu_count(), initializer=_init_worker) as pool:
+        return pool.map(run_session, recordings, chunksize=1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mission', choices=replay.MISSIONS)
+    parser.add_argument('recordings', nargs='+', help='frame directories, .rec or .npz files')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes, one per core by default')
+    parser.add_argument('--sign', type=int, default=None,
+                        help='offline only: sign id the stand-in SVM reports for every detected sign')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the stand-in services even if the real ones are importable')
+    parser.add_argument('--json', help='write the session summaries to this file')
+    args = parser.parse_args(argv)
+
+    offline_services.install(sign_id=args.sign, force=args.offline)
+    import debug_writer
+    debug_writer.configure(enabled=False)
+
+    start = time.perf_counter()
+    summaries = run_fleet(args.mission, args.recordings, args.processes)
+    wall = time.perf_counter() - start
+
+    for s in summaries:
+        print('%s: %d frames, %.1f fps, mean %.2f ms, p95 %.2f ms, stopped %d, %d events'
+              % (s['recording'], s['frames'], s['fps'], s['mean_ms'], s['p95_ms'], s['stopped_frames'],
+                 sum(s['events'].values())))
+    frames = sum(s['frames'] for s in summaries)
+    print('%d sessions, %d frames in %.1f s, %.1f frames/s overall'
+          % (len(summaries), frames, wall, frames / wall))
+    if args.json:
+        with open(args.json, 'w') as f:
+            # numpy scalars, e.g. an id_num from the SVM, as plain numbers
+            json.dump(summaries, f, indent=2, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
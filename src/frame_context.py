@@ -0,0 +1,43 @@
+import cv2
+
+class FrameContext:
+    """Per-frame cache for one camera view.
+
+    Stages only convert the part of the view they look at: hsv_region
+    converts a region once per frame and hands the same array to every
+    later request for it. Cached arrays are shared: copy before writing.
+
+    at(scale) gives the context of a smaller copy of the view, so stages
+    that work at the same reduced resolution share one image pyramid.
+    """
+    def __init__(self, view):
+        self.view = view
+        self._levels = {}
+        self._regions = {}
+
+    def at(self, scale):
+        """Context of the view resized by `scale`, built once per frame from
+        the nearest larger level."""
+        if scale == 1:
+            return self
+        if scale not in self._levels:
+            larger = [s for s in self._levels if s > scale]
+            source = self._levels[min(larger)].view if larger else self.view
+            h, w = self.view.shape[:2]
+            size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+            self._levels[scale] = FrameContext(cv2.resize(source, size, interpolation=cv2.INTER_AREA))
+        return self._levels[scale]
+
+    def hsv_region(self, y_start, y_end, x_start, x_end):
+        """HSV of part of the view, converted on first use."""
+        key = (y_start, y_end, x_start, x_end)
+        if key not in self._regions:
+            self._regions[key] = cv2.cvtColor(self.view[y_start:y_end, x_start:x_end],
+                                              cv2.COLOR_BGR2HSV)
+        return self._regions[key]
+
+def context_for(view, ctx=None):
+    """`ctx` when given, otherwise a fresh context for `view`."""
+    if ctx is None:
+        ctx = FrameContext(view)
+    return ctx
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+def fit_line(mask):
+    """Total least squares line through the nonzero pixels of `mask`.
+
+    The line is the principal axis of the pixels, found from the second
+    central moments of the mask in one cv2.moments pass. Returns
+    (slope, confidence, count): slope is dy/dx in image coordinates
+    (np.inf for a vertical line, None without pixels), confidence is
+    1 - minor/major eigenvalue, 1 for a thin straight line and 0 for a
+    round blob, and count is the number of pixels.
+    """
+    m = cv2.moments(mask, binaryImage=True)
+    count = int(m['m00'])
+    if count < 2:
+        return None, 0.0, count
+    # covariance of the pixel coordinates
+    a = m['mu20'] / count
+    b = m['mu11'] / count
+    c = m['mu02'] / count
+    spread = np.hypot(a - c, 2 * b)
+    major = (a + c + spread) / 2
+    minor = (a + c - spread) / 2
+    confidence = 1 - minor / major if major > 0 else 0.0
+    # direction of the major axis
+    dx, dy = major - c, b
+    if dx == 0 and dy == 0:
+        # no off-diagonal term, the axis is along x or y
+        dx, dy = (1, 0) if a >= c else (0, 1)
+    slope = dy / dx if dx != 0 else np.inf
+    return slope, confidence, count
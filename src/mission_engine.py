@@ -0,0 +1,207 @@
+"""Runs a mission declared as the stages it uses.
+
+    mission = Mission({
+        'lane': {'top': 50, 'bottom': 65},
+        'sign': {},
+        'traffic_light': {},
+    })
+
+Keys name entries of stages.STAGES and values are their options. Lane
+missions need 'lane', and parking missions, the ones with 'parking', need
+'sign' to find the parking sign; every other stage is optional. A stage
+is only built the first time the current mission phase needs it: the
+traffic light stage when the car reaches a junction sign, the parking
+stage once the parking sign was seen. warmup() builds the stages needed
+from the first frame.
+"""
+import parallel
+from car_state import CarState
+from controls import log, stop_fn, turn_right_fn, turn_left_fn, straight_fn
+from debug_writer import imwrite
+import event_log
+from frame_context import FrameContext
+from stages import STAGES
+
+class Mission:
+    def __init__(self, stages):
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError("unknown stages: %s" % ', '.join(sorted(unknown)))
+        required = ('sign', 'parking') if 'parking' in stages else ('lane',)
+        missing = [name for name in required if name not in stages]
+        if missing:
+            raise ValueError("missing stages: %s" % ', '.join(missing))
+        self.stages = dict(stages)
+        # the process-wide controls.log every stage writes to
+        self.log = log
+        # a recording.FrameRecorder to store every frame in, or None
+        self.recorder = None
+        # a deadline.DeadlineScheduler holding frames to a time budget, or None
+        self.deadline = None
+        self._built = {}
+
+    def uses(self, name):
+        return name in self.stages
+
+    def stage(self, name):
+        """The stage called `name`, built on first use."""
+        if name not in self._built:
+            self._built[name] = STAGES[name](**self.stages[name])
+        return self._built[name]
+
+    def warmup(self):
+        """Build the stages the first frame needs, so it is not slow."""
+        for name in ('lane', 'sign', 'pedestrian'):
+            if self.uses(name):
+                self.stage(name)
+
+    def run(self, stage, fn, *args, degraded=False):
+        """fn(*args), timed by the deadline scheduler if there is one."""
+        if self.deadline is None:
+            return fn(*args)
+        return self.deadline.run(stage, fn, *args, degraded=degraded)
+
+    def perceive(self, stage, fn, *args, degraded=False):
+        """self.run(stage, fn, *args), or its result on an earlier frame while
+        view2 has not changed, see unchanged_view.py."""
+        if self.uses('unchanged_view') and not degraded:
+            return self.stage('unchanged_view').get(
+                stage, lambda: self.run(stage, fn, *args))
+        return self.run(stage, fn, *args, degraded=degraded)
+
+    def degrade(self, name):
+        """Whether the deadline scheduler gives up `name` this frame."""
+        return self.deadline is not None and self.deadline.degrade(name)
+
+    def image_to_speed(self, view1, view2, state, detect_lane=None):
+        """One frame of the mission. `detect_lane` can replace the lane
+        stage's detect(view1, car, ctx), e.g. with precomputed results."""
+        car = CarState.load(state)
+        car.state += 1
+        if self.recorder is not None:
+            record = self.recorder.append(view1, view2)
+
+        state_str = str(car.state)
+        log.event(event_log.FRAME, car.state)
+        imwrite(state_str + '-1.jpg', view1)
+        imwrite(state_str + '-2.jpg', view2)
+
+        ctx1 = FrameContext(view1)
+        ctx2 = FrameContext(view2)
+
+        if self.uses('parking'):
+            left_speed, right_speed = self.parking_frame(view1, view2, car, ctx1, ctx2)
+        else:
+            if self.deadline is not None:
+                self.deadline.start(self.lane_frame_stages(car))
+            left_speed, right_speed = self.lane_frame(view1, view2, car, ctx1, ctx2, detect_lane)
+            if self.deadline is not None:
+                self.deadline.finish()
+
+        if self.recorder is not None:
+            self.recorder.finish(record, car, left_speed, right_speed)
+        car.commit(state)
+        return left_speed, right_speed
+
+    def lane_frame_stages(self, car):
+        """The stages a lane frame is expected to run."""
+        stages = [name for name in ('lane', 'sign', 'pedestrian') if self.uses(name)]
+        if car.id_num in (34, 35) and car.color_id != 3 and self.uses('traffic_light'):
+            stages.append('traffic_light')
+        return stages
+
+    def lane_frame(self, view1, view2, car, ctx1, ctx2, detect_lane=None):
+        lane = self.stage('lane')
+        detect_lane = detect_lane or lane.detect
+        sign = self.stage('sign') if self.uses('sign') else None
+        id_num = car.id_num
+
+        if self.uses('unchanged_view'):
+            self.stage('unchanged_view').start(view2, car.current_speed == 0, ctx2)
+
+        # view1 and view2 stages may run concurrently, see parallel.py
+        if view1 is not None:
+            yellow = parallel.submit(self.run, 'lane', detect_lane, view1, car, ctx1)
+
+        if view2 is not None:
+            if self.uses('pedestrian'):
+                coarse = self.degrade('coarse_pedestrian')
+                # not reused while view2 is unchanged: its MotionGate already
+                # skips the HOG on a still view, and keeps its max_skip cadence
+                pedestrian = parallel.submit(lambda: self.run('pedestrian', self.stage('pedestrian').detect,
+                                                              view2, car, coarse, degraded=coarse))
+
+            if sign is not None:
+                # sign recognition is scheduled on the lane state of the previous
+                # frame, so it does not wait for view1 and both chains overlap
+                def recognise(has_yellow):
+                    # the sign only matters once the line ends, keep the last one meanwhile
+                    if has_yellow and self.degrade('skip_sign'):
+                        return car.id_num
+                    return self.perceive('sign', sign.recognise, view2, car, has_yellow, ctx2)
+                sign.ran = False
+                recognised = parallel.submit(recognise, sign.has_yellow)
+
+        if view1 is not None:
+            has_yellow, moments = yellow.result()
+            if sign is not None:
+                sign.has_yellow = has_yellow
+
+        has_pedestrian = False
+        if view2 is not None:
+            if self.uses('pedestrian'):
+                has_pedestrian = pedestrian.result()
+            if sign is not None:
+                id_num = car.id_num = recognised.result()
+                if view1 is not None and not has_yellow and not sign.ran:
+                    # the line ended on this frame and the schedule skipped the
+                    # sign, which decides what to do now: recognise it anyway
+                    id_num = car.id_num = recognise(False)
+
+        if has_pedestrian:
+            left_speed, right_speed = stop_fn(car)
+
+        elif not has_yellow:
+            #check traffic light if id_num == 34 or id_num == 35
+            if id_num in (34, 35) and self.uses('traffic_light') \
+                    and not self.may_go(view2, car, ctx2):
+                left_speed, right_speed = stop_fn(car)
+
+            elif id_num == 14:
+                left_speed, right_speed = stop_fn(car)
+
+            elif id_num == 33:
+                left_speed, right_speed = turn_right_fn(car, 0.6, 0.4) #0.6, 0.2
+
+            elif id_num == 34:
+                left_speed, right_speed = turn_left_fn(car, 0.6, 0.5) #0.6, 0.3
+
+            elif id_num == 35:
+                left_speed, right_speed = straight_fn(car, 1.0)
+
+        else:
+            # follow line
+            car.color_id = None
+            left_speed, right_speed = lane.follow(view1, moments, car)
+
+        car.current_speed = max(left_speed, right_speed)
+        return left_speed, right_speed
+
+    def may_go(self, view2, car, ctx2):
+        # still waiting on a red or yellow light, it can wait one more frame
+        if car.color_id in (0, 1) and self.degrade('reuse_light'):
+            return False
+        return self.perceive('traffic_light', self.stage('traffic_light').may_go, view2, car, ctx2)
+
+    def parking_frame(self, view1, view2, car, ctx1, ctx2):
+        id_num = car.id_num
+
+        if view2 is not None and id_num != 33:
+            id_num = car.id_num = self.stage('sign').recognise(view2, car, False, ctx2)
+
+        if id_num == 33:
+            # sign found
+            return self.stage('parking').step(view1, view2, car, ctx1, ctx2)
+
+        # sign not found
+        return 1.0, 1.0
@@ -0,0 +1,51 @@
+import cv2
+from services.detection import detection
+from services.svm import SVM
+
+# models are built once per process and shared by every call of
+# image_to_speed, instead of being constructed again on each frame
+_models = {}
+
+def get_detector():
+    if 'detector' not in _models:
+        _models['detector'] = detection()
+    return _models['detector']
+
+def get_svm():
+    if 'svm' not in _models:
+        _models['svm'] = SVM()
+    return _models['svm']
+
+def get_pedestrian_hog(path='./services/myHogDector.bin', nlevels=64):
+    """HOG pedestrian detector loaded from `path`, with at most `nlevels`
+    pyramid levels in detectMultiScale."""
+    key = ('pedestrian_hog', path, nlevels)
+    if key not in _models:
+        loaded = cv2.HOGDescriptor()
+        loaded.load(path)
+        if loaded.nlevels == nlevels:
+            hog = loaded
+        else:
+            # nlevels is read-only once built, rebuild with the loaded detector
+            hog = cv2.HOGDescriptor(loaded.winSize, loaded.blockSize,
+                                    loaded.blockStride, loaded.cellSize,
+                                    loaded.nbins, loaded.derivAperture,
+                                    loaded.winSigma, loaded.histogramNormType,
+                                    loaded.L2HysThreshold,
+                                    loaded.gammaCorrection, nlevels,
+                                    loaded.signedGradient)
+            hog.setSVMDetector(loaded.svmDetector)
+        _models[key] = hog
+    return _models[key]
+
+def set_pedestrian_hog(hog, path='./services/myHogDector.bin', nlevels=64):
+    """Use `hog` wherever get_pedestrian_hog(path, nlevels) is asked for."""
+    _models[('pedestrian_hog', path, nlevels)] = hog
+
+def warmup():
+    """Load every model now so that the first frame is not slow."""
+    get_detector()
+    get_svm()
+
+def clear():
+    _models.clear()
@@ -0,0 +1,72 @@
+import cv2
+
+class MotionGate:
+    """Skips an expensive detector while its input region is not changing.
+
+    The region is shrunk by `scale` to grey and compared with the copy taken
+    the last time the detector ran. The detector runs again when more than
+    `min_changed` pixels differ by more than `threshold`, and at least every
+    `max_skip` frames whatever happens. A count rather than a mean, so a
+    pedestrian entering a small part of the region is a change. Skipped
+    frames repeat the last result.
+
+    While the car is stopped a positive is held for `hold_frames` frames
+    after the detector last saw it, so the car does not pull away when a
+    single detection drops out.
+    """
+    def __init__(self, threshold=20, min_changed=16, scale=0.25, max_skip=5, hold_frames=10):
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.scale = scale
+        self.max_skip = max_skip
+        self.hold_frames = hold_frames
+        self.reference = None
+        self.last = False
+        self.since_run = 0
+        self.since_positive = None
+        self.stats = {'runs': 0, 'skips': 0, 'held': 0}
+
+    def _small(self, region):
+        small = cv2.resize(region, None, fx=self.scale, fy=self.scale,
+                           interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def changed(self, small):
+        if self.reference is None or self.reference.shape != small.shape:
+            return True
+        diff = cv2.absdiff(small, self.reference)
+        changed = cv2.countNonZero(cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)[1])
+        return changed > self.min_changed
+
+    def run(self, region, detect, stopped=False):
+        """detect() when `region` moved or is due for a check, otherwise the
+        last result; with the hold applied while `stopped`."""
+        small = self._small(region)
+        if self.since_run + 1 < self.max_skip and not self.changed(small):
+            self.since_run += 1
+            self.stats['skips'] += 1
+            found = self.last
+        else:
+            found = bool(detect())
+            self.reference = small
+            self.since_run = 0
+            self.stats['runs'] += 1
+            self.last = found
+
+        if found:
+            self.since_positive = 0
+            return True
+        if self.since_positive is not None:
+            self.since_positive += 1
+            if stopped and self.since_positive <= self.hold_frames:
+                self.stats['held'] += 1
+                return True
+        return False
+
+    def reset(self):
+        self.reference = None
+        self.last = False
+        self.since_run = 0
+        self.since_positive = None
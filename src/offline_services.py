@@ -0,0 +1,85 @@
+"""Stand-ins for the simulator side, so the mission modules can be driven
+without the simulator: the `state` holder and the `services.detection`,
+`services.svm` and `services.utils` modules."""
+import sys
+import types
+
+import cv2
+
+class StateHolder:
+    """Same get()/set() interface as the simulator's car state."""
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class StandInDetector:
+    """Reports the bounding box of the largest saturated blue or red blob,
+    a rough stand-in for a traffic sign, or None when there is none."""
+    min_area = 200
+
+    def ensemble(self, im):
+        hsv = cv2.cvtColor(im, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (100, 150, 80), (130, 255, 255)) | \
+               cv2.inRange(hsv, (0, 150, 80), (8, 255, 255))
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(mask)
+        if n < 2:
+            return None
+        best = 1 + stats[1:, cv2.CC_STAT_AREA].argmax()
+        x, y, w, h, area = stats[best]
+        if area < self.min_area:
+            return None
+        return int(x), int(y), int(x + w), int(y + h)
+
+class StandInSVM:
+    """Classifies every sign as `sign_id`."""
+    sign_id = None
+
+    def predict(self, roi, method):
+        return self.sign_id
+
+def stand_in_imwrite(name, img):
+    pass
+
+def install(sign_id=None, force=False):
+    """Register the stand-in services modules.
+
+    Does nothing when the real `services` package can be imported, unless
+    `force` is set. The SVM classifies every sign the stand-in detector
+    finds as `sign_id`.
+    Must run before any mission module is imported.
+    """
+    if not force:
+        try:
+            import services.detection, services.svm, services.utils
+            return False
+        except ImportError:
+            pass
+
+    StandInSVM.sign_id = sign_id
+
+    services = types.ModuleType('services')
+    services.__path__ = []
+    modules = {
+        'detection': {'detection': StandInDetector},
+        'svm': {'SVM': StandInSVM},
+        'utils': {'imwrite': stand_in_imwrite},
+    }
+    sys.modules['services'] = services
+    for name, attrs in modules.items():
+        module = types.ModuleType('services.' + name)
+        module.__dict__.update(attrs)
+        sys.modules['services.' + name] = module
+        setattr(services, name, module)
+
+    # the pedestrian mission loads ./services/myHogDector.bin at import,
+    # fall back to OpenCV's bundled people detector
+    import model_cache
+    hog = cv2.HOGDescriptor()
+    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    model_cache.set_pedestrian_hog(hog)
+    return True
@@ -0,0 +1,51 @@
+"""Runs the per-view perception stages of a frame concurrently.
+
+image_to_speed hands its stages to submit() and joins them with result()
+before making the control decision. With config['enabled'] False (the
+default) submit() runs the stage on the spot, so both modes call the same
+stages in the same order and return the same speeds. When enabled, stages
+run on a persistent thread pool of config['workers'] threads; OpenCV
+releases the GIL inside its calls, so the frame takes about as long as its
+slowest chain of stages. A stage that needs another stage's output calls
+that future's result() itself, and must be submitted after it.
+"""
+import concurrent.futures
+
+config = {
+            'enabled': False,
+            'workers': 2,
+              }
+_pool = None
+
+class Done:
+    """Already computed result with the Future interface."""
+    def __init__(self, fn, args):
+        self._value = self._error = None
+        try:
+            self._value = fn(*args)
+        except Exception as e:
+            self._error = e
+
+    def result(self, timeout=None):
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+def pool():
+    global _pool
+    if _pool is None or _pool._max_workers != config['workers']:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+        _pool = concurrent.futures.ThreadPoolExecutor(config['workers'], thread_name_prefix='perception')
+    return _pool
+
+def submit(fn, *args):
+    if not config['enabled']:
+        return Done(fn, args)
+    return pool().submit(fn, *args)
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
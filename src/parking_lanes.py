@@ -0,0 +1,140 @@
+import cv2
+import numpy as np
+
+class ParkingLaneTracker:
+    """Finds the white parking lines in the bottom band of view2, from
+    `top` (a fraction of its height) down, and follows them from frame to
+    frame. The other sizes are in pixels of the view searched.
+
+    While a lane is tracked the Hough transform only runs on a corridor of
+    columns `corridor` px around its last estimate. The rest of the band is
+    only searched for another lane when it has enough white pixels to hold
+    one. A tracked lane that is not found keeps its estimate for up to
+    `max_misses` frames, then the track is dropped and the whole band is
+    searched again.
+
+    Segments are grouped into lanes by their midpoint column: by the
+    nearest tracked lane, or by a two-means split after a full search,
+    where centres less than `split` px apart make a single lane.
+    """
+    def __init__(self, top=350/480, corridor=40, split=100, min_slope=0.2,
+                 threshold=60, max_line_gap=200, max_misses=3):
+        self.top = top
+        self.corridor = corridor
+        self.split = split
+        self.min_slope = min_slope
+        self.threshold = threshold
+        self.max_line_gap = max_line_gap
+        self.max_misses = max_misses
+        self.lanes = []         # (x0, y0, x1, y1) estimates, left to right
+        self.misses = 0
+        self.stats = {'tracked': 0, 'misses': 0, 'probes': 0, 'full_searches': 0}
+
+    def hough(self, mask, x_start=0, y_start=0):
+        """Segments of `mask` steeper than min_slope, as an (n, 4) array in
+        view coordinates."""
+        lines = cv2.HoughLinesP(mask, 1, np.pi/180, self.threshold, maxLineGap=self.max_line_gap)
+        if lines is None:
+            return np.empty((0, 4), int)
+        lines = lines[:, 0] + (x_start, y_start, x_start, y_start)
+        dx = lines[:, 2] - lines[:, 0]
+        dy = lines[:, 3] - lines[:, 1]
+        return lines[np.abs(dy) > self.min_slope * np.abs(dx)]
+
+    def group(self, lines):
+        """Lanes of a full search, left to right, each the average of its
+        segments."""
+        mid = (lines[:, 0] + lines[:, 2]) / 2
+        labels = np.zeros(len(lines), int)
+        if mid.max() - mid.min() > self.split:
+            centres = np.array([mid.min(), mid.max()])
+            for _ in range(10):
+                labels = np.abs(mid[:, None] - centres).argmin(axis=1)
+                moved = np.array([mid[labels == k].mean() for k in (0, 1)])
+                if (moved == centres).all():
+                    break
+                centres = moved
+            if centres[1] - centres[0] <= self.split:
+                labels[:] = 0
+        return [np.average(lines[labels == k], axis=0).astype(int) for k in np.unique(labels)]
+
+    def near(self, lines, lane):
+        """The segments whose midpoint is within `corridor` px of `lane`."""
+        x0, y0, x1, y1 = lane
+        mid_x = (lines[:, 0] + lines[:, 2]) / 2
+        mid_y = (lines[:, 1] + lines[:, 3]) / 2
+        lane_x = x0 + (x1 - x0) * (mid_y - y0) / (y1 - y0) if y1 != y0 else (x0 + x1) / 2
+        return lines[np.abs(mid_x - lane_x) <= self.corridor]
+
+    def window(self, lane, right):
+        x0, y0, x1, y1 = lane
+        return max(0, min(x0, x1) - self.corridor), min(right, max(x0, x1) + self.corridor)
+
+    def track(self, mask_of, top, h, right):
+        """Updates the tracked lanes from their corridors. False when the
+        track was lost and the band has to be searched again."""
+        lanes = []
+        windows = []
+        found = False
+        for lane in self.lanes:
+            x_start, x_end = self.window(lane, right)
+            windows.append((x_start, x_end))
+            lines = self.hough(mask_of(top, h, x_start, x_end), x_start, top) \
+                if x_end > x_start else np.empty((0, 4), int)
+            lines = self.near(lines, lane)
+            if len(lines):
+                found = True
+                lane = np.average(lines, axis=0).astype(int)
+            lanes.append(lane)
+
+        if not found:
+            self.misses += 1
+            self.stats['misses'] += 1
+            if self.misses >= self.max_misses:
+                self.lanes = []
+                return False
+            return True
+
+        self.misses = 0
+        self.stats['tracked'] += 1
+        if len(lanes) == 1:
+            # look for the other lane outside the corridor, if it could be there
+            x_start, x_end = windows[0]
+            for start, end in ((0, x_start), (x_end, right)):
+                if end <= start:
+                    continue
+                mask = mask_of(top, h, start, end)
+                if cv2.countNonZero(mask) < self.threshold:
+                    continue
+                self.stats['probes'] += 1
+                lines = self.hough(mask, start, top)
+                if len(lines):
+                    lanes.append(np.average(lines, axis=0).astype(int))
+                    break
+        self.lanes = sorted(lanes, key=lambda lane: lane[0] + lane[2])
+        return True
+
+    def detect(self, mask_of, shape, right=None):
+        """(left_lane, right_lane), each (x0, y0, x1, y1) or None.
+
+        mask_of(y_start, y_end, x_start, x_end) returns the white mask of that
+        part of the view. Columns from `right` on are ignored.
+        """
+        h, w = shape[:2]
+        top = int(round(self.top * h))
+        right = w if right is None else right
+        if not (self.lanes and self.track(mask_of, top, h, right)):
+            self.stats['full_searches'] += 1
+            lines = self.hough(mask_of(top, h, 0, right), 0, top)
+            self.lanes = self.group(lines) if len(lines) else []
+            self.misses = 0
+
+        if not self.lanes:
+            return None, None
+        if len(self.lanes) == 1:
+            return self.lanes[0], None
+        return self.lanes[0], self.lanes[-1]
+
+    def reset(self):
+        self.lanes = []
+        self.misses = 0
@@ -0,0 +1,138 @@
+"""Raw frame recordings in one preallocated, memory-mapped file.
+
+The file is a small header followed by `capacity` fixed-size records, one
+per frame: the raw view1 and view2 pixels, the car state after the frame
+and the wheel speeds it produced. Frame i always lives at the same offset,
+so writing a frame is a copy into the mapping and reading a range of
+frames gives NumPy views straight onto the file, without decoding or
+copying anything.
+
+    recorder = FrameRecorder('drive.rec', capacity=20000)
+    mission.recorder = recorder          # see mission_engine.Mission
+    ...
+    reader = FrameReader('drive.rec')
+    views1, views2 = reader.views(0, 1000)
+"""
+import json
+
+import numpy as np
+
+MAGIC = b'SDCREC1\0'
+HEADER_SIZE = 4096
+# header: MAGIC, frame count (uint64), then the layout as JSON
+_COUNT = np.dtype('<u8')
+_NONE = -1
+
+def record_dtype(view1_shape, view2_shape):
+    return np.dtype([
+        ('view1', np.uint8, tuple(view1_shape)),
+        ('view2', np.uint8, tuple(view2_shape)),
+        ('frame', '<i4'),
+        ('id_num', '<i4'),
+        ('color_id', '<i2'),
+        ('parking_state', '<i2'),
+        ('current_speed', '<f4'),
+        ('left', '<f4'),
+        ('right', '<f4'),
+    ])
+
+def _open(path, mode, layout=None):
+    header = np.memmap(path, np.uint8, mode, shape=(HEADER_SIZE,))
+    if layout is not None:
+        header[:len(MAGIC)] = np.frombuffer(MAGIC, np.uint8)
+        text = json.dumps(layout).encode()
+        if len(MAGIC) + _COUNT.itemsize + len(text) > HEADER_SIZE:
+            raise ValueError("recording layout does not fit in the header")
+        header[len(MAGIC) + _COUNT.itemsize:][:len(text)] = np.frombuffer(text, np.uint8)
+    elif bytes(header[:len(MAGIC)]) != MAGIC:
+        raise ValueError("%s is not a frame recording" % path)
+    count = header[len(MAGIC):len(MAGIC) + _COUNT.itemsize].view(_COUNT)
+    text = bytes(header[len(MAGIC) + _COUNT.itemsize:]).rstrip(b'\0')
+    layout = json.loads(text)
+    dtype = record_dtype(layout['view1_shape'], layout['view2_shape'])
+    records = np.memmap(path, dtype, mode,
+                        offset=HEADER_SIZE, shape=(layout['capacity'],))
+    return header, count, records
+
+class FrameRecorder:
+    """Appends frames to a new recording of `capacity` frames."""
+    def __init__(self, path, capacity, view1_shape=(120, 160, 3), view2_shape=(480, 640, 3)):
+        layout = {'capacity': int(capacity),
+                  'view1_shape': list(view1_shape), 'view2_shape': list(view2_shape)}
+        size = HEADER_SIZE + capacity * record_dtype(view1_shape, view2_shape).itemsize
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        self.path = path
+        self._header, self._count, self.records = _open(path, 'r+', layout)
+        self._count[0] = 0
+        # frames that came after the recording was full
+        self.dropped = 0
+
+    def __len__(self):
+        return int(self._count[0])
+
+    def append(self, view1, view2):
+        """Store the raw views of the next frame, returns its index, or None
+        once the recording is full and the frame is dropped. Call before
+        anything draws on the views."""
+        i = len(self)
+        if i >= len(self.records):
+            # recording must never stop the car, just count what is lost
+            self.dropped += 1
+            return None
+        record = self.records[i]
+        if view1 is not None:
+            record['view1'] = view1
+        if view2 is not None:
+            record['view2'] = view2
+        self._count[0] = i + 1
+        return i
+
+    def finish(self, index, car, left_speed, right_speed):
+        """Store the state and speeds frame `index` ended with. Does nothing
+        for a dropped frame, whose index is None."""
+        if index is None:
+            return
+        record = self.records[index]
+        record['frame'] = car.state
+        record['id_num'] = _NONE if car.id_num is None else car.id_num
+        record['color_id'] = _NONE if car.color_id is None else car.color_id
+        record['parking_state'] = car.parking_state
+        record['current_speed'] = car.current_speed
+        record['left'] = left_speed
+        record['right'] = right_speed
+
+    def flush(self):
+        self.records.flush()
+        self._header.flush()
+
+    def close(self):
+        self.flush()
+        del self.records, self._header, self._count
+
+class FrameReader:
+    """Read-only access to a recording. Everything returned is a view onto
+    the mapped file."""
+    def __init__(self, path):
+        self.path = path
+        self._header, self._count, records = _open(path, 'r')
+        self.records = records[:int(self._count[0])]
+
+    def __len__(self):
+        return len(self.records)
+
+    def views(self, start=0, stop=None):
+        """(views1, views2) stacked arrays of frames start..stop."""
+        records = self.records[start:stop]
+        return records['view1'], records['view2']
+
+    def speeds(self, start=0, stop=None):
+        records = self.records[start:stop]
+        return records['left'], records['right']
+
+    def states(self, start=0, stop=None):
+        """The per-frame state fields, -1 stands for None."""
+        return self.records[start:stop][['frame', 'id_num', 'color_id', 'parking_state', 'current_speed']]
+
+    def __getitem__(self, i):
+        return self.records[i]['view1'], self.records[i]['view2']
@@ -0,0 +1,132 @@
+"""Replay recorded frames through a mission module without the simulator.
+
+    python replay.py follow_line_final recording/
+    python replay.py parking_final frames.npz --sign 33 --speeds speeds.csv
+
+A recording is a directory of the '<n>-1.jpg' / '<n>-2.jpg' dumps written
+by image_to_speed, a .rec file written by recording.FrameRecorder, or an
+.npz file holding `view1` and `view2` arrays stacked along the first axis.
+"""
+import argparse
+import importlib
+import os
+import re
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import offline_services
+from recording import FrameReader
+
+MISSIONS = [
+    'follow_line_final',
+    'parking_final',
+    'follow_line_trafficlight_final',
+    'follow_line_pedestrian_final',
+]
+
+def load_frames(path):
+    """List of (view1, view2) pairs in recording order."""
+    if os.path.isdir(path):
+        views = {}
+        for name in os.listdir(path):
+            m = re.match(r'(\d+)-([12])\.jpg$', name)
+            if m:
+                views.setdefault(int(m.group(1)), [None, None])[int(m.group(2)) - 1] = \
+                    cv2.imread(os.path.join(path, name))
+        return [tuple(views[n]) for n in sorted(views)]
+
+    if path.endswith('.rec'):
+        return list(zip(*FrameReader(path).views()))
+
+    data = np.load(path)
+    return list(zip(data['view1'], data['view2']))
+
+def replay(mission, frames, state=None, events=None):
+    """Feed every frame through mission.image_to_speed.
+
+    Returns (seconds, speeds): the wall time of each call and the
+    (left, right) speeds it returned. The log is cleared after every frame;
+    pass a collections.Counter as `events` to count its events by code.
+    """
+    if state is None:
+        state = offline_services.StateHolder()
+    seconds = []
+    speeds = []
+    for view1, view2 in frames:
+        # image_to_speed draws on its views, keep the recording intact
+        view1 = None if view1 is None else view1.copy()
+        view2 = None if view2 is None else view2.copy()
+        start = time.perf_counter()
+        speed = mission.image_to_speed(view1, view2, state)
+        seconds.append(time.perf_counter() - start)
+        speeds.append(speed)
+        if events is not None:
+            events.update(code for code, fields in mission.log.events())
+        mission.log.clear()
+    return seconds, speeds
+
+def summary(seconds):
+    ms = np.array(seconds) * 1000
+    return ("%d frames, %.1f fps, mean %.2f ms, p50 %.2f ms, p95 %.2f ms, max %.2f ms"
+            % (len(ms), len(ms) / (ms.sum() / 1000), ms.mean(),
+               np.percentile(ms, 50), np.percentile(ms, 95), ms.max()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('mission', choices=MISSIONS)
+    parser.add_argument('recording', help='frame directory, .rec or .npz file')
+    parser.add_argument('--sign', type=int, default=None,
+                        help='offline only: sign id the stand-in SVM reports for every detected sign')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the stand-in services even if the real ones are importable')
+    parser.add_argument('--debug-dumps', action='store_true',
+                        help='keep writing the debug images')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='run the per-view stages on a pool of this many threads')
+    parser.add_argument('--timing', action='store_true',
+                        help='print per-stage latency percentiles at the end')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='hold every frame to this time budget, see deadline.py')
+    parser.add_argument('--speeds', help='write the per-frame time and speeds to this csv file')
+    args = parser.parse_args(argv)
+
+    offline_services.install(sign_id=args.sign, force=args.offline)
+    import debug_writer
+    debug_writer.configure(enabled=args.debug_dumps)
+    import timing
+    timing.config['enabled'] = args.timing
+    timing.config['dump_at_exit'] = False
+    import parallel
+    parallel.config['enabled'] = args.workers > 0
+    parallel.config['workers'] = max(args.workers, 1)
+    mission = importlib.import_module(args.mission)
+    if args.budget_ms is not None:
+        from deadline import DeadlineScheduler
+        mission.mission.deadline = DeadlineScheduler(budget_ms=args.budget_ms)
+
+    frames = load_frames(args.recording)
+    if not frames:
+        parser.error('no frames found in %s' % args.recording)
+    seconds, speeds = replay(mission, frames)
+
+    if args.speeds:
+        with open(args.speeds, 'w') as f:
+            f.write('frame,ms,left,right\n')
+            for i, (s, (left, right)) in enumerate(zip(seconds, speeds)):
+                f.write('%d,%.3f,%.3f,%.3f\n' % (i + 1, s * 1000, left, right))
+    else:
+        for i, (s, (left, right)) in enumerate(zip(seconds, speeds)):
+            print('%d %.2fms l:%.2f r:%.2f' % (i + 1, s * 1000, left, right))
+    print(summary(seconds))
+    if args.timing:
+        timing.dump(sys.stdout)
+    if args.budget_ms is not None:
+        for name, (count, rate) in mission.mission.deadline.report().items():
+            print('%-20s %6d %6.1f%%' % (name, count, rate * 100))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
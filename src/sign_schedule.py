@@ -0,0 +1,33 @@
+class SignScheduler:
+    """Decides on which frames the sign detector and SVM have to run.
+
+    While the yellow line is visible the sign only matters once the line
+    ends, so recognition runs every `search_every` frames until a sign is
+    locked and every `locked_every` frames after that. Once the line is
+    gone it runs on every frame. Skipped frames keep car.id_num, the last
+    recognised sign.
+    """
+    def __init__(self, search_every=2, locked_every=5):
+        self.search_every = search_every
+        self.locked_every = locked_every
+        self.runs = 0
+        self.skips = 0
+        self._since_run = None
+
+    def cadence(self, has_yellow, id_num):
+        if not has_yellow:
+            return 1
+        if id_num is None:
+            return self.search_every
+        return self.locked_every
+
+    def should_run(self, has_yellow, id_num):
+        run = self._since_run is None or self._since_run + 1 >= self.cadence(has_yellow, id_num)
+        if run:
+            self._since_run = 0
+            self.runs += 1
+        else:
+            self._since_run += 1
+            self.skips += 1
+        return run
+
@@ -0,0 +1,55 @@
+class SignTracker:
+    """Runs the sign detector around the last detection instead of over the
+    whole view.
+
+    After a hit the next search covers the previous rect grown by `margin`
+    of its size on every side (and at least `min_size`). After `max_misses`
+    misses in a row the track is dropped and the whole view is searched.
+    """
+    def __init__(self, margin=1.0, min_size=(120, 120), max_misses=3):
+        self.margin = margin
+        self.min_size = min_size
+        self.max_misses = max_misses
+        self.rect = None
+        self.misses = 0
+        self.stats = {'hits': 0, 'misses': 0, 'full_searches': 0, 'full_hits': 0}
+
+    def window(self, rect, shape):
+        h, w = shape[:2]
+        xmin, ymin, xmax, ymax = rect
+        pad_x = max(int((xmax - xmin) * self.margin), (self.min_size[0] - (xmax - xmin)) // 2)
+        pad_y = max(int((ymax - ymin) * self.margin), (self.min_size[1] - (ymax - ymin)) // 2)
+        return (max(0, xmin - pad_x), max(0, ymin - pad_y),
+                min(w, xmax + pad_x), min(h, ymax + pad_y))
+
+    def detect(self, detector, im):
+        """detector.ensemble(im), searching only near the last sign while
+        it is being tracked. Returns a full view (xmin, ymin, xmax, ymax)
+        or None."""
+        if self.rect is None:
+            self.stats['full_searches'] += 1
+            rect = detector.ensemble(im)
+            if rect:
+                self.stats['full_hits'] += 1
+                self.rect = tuple(rect)
+                self.misses = 0
+            return rect
+
+        x0, y0, x1, y1 = self.window(self.rect, im.shape)
+        rect = detector.ensemble(im[y0:y1, x0:x1])
+        if rect:
+            xmin, ymin, xmax, ymax = rect
+            self.rect = (xmin + x0, ymin + y0, xmax + x0, ymax + y0)
+            self.misses = 0
+            self.stats['hits'] += 1
+            return self.rect
+
+        self.misses += 1
+        self.stats['misses'] += 1
+        if self.misses >= self.max_misses:
+            self.rect = None
+        return None
+
+    def reset(self):
+        self.rect = None
+        self.misses = 0
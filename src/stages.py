@@ -0,0 +1,439 @@
+"""Perception and control stages the missions are assembled from.
+
+Each stage is created by Mission.stage() the first time a mission phase
+needs it, with the options given in the mission's declaration.
+"""
+import numpy as np
+import cv2
+
+from debug_writer import imwrite
+import model_cache
+import timing
+import event_log
+import traffic_light
+from controls import log, stop_fn, turn_right_fn, turn_left_fn, straight_fn, reverse_fn
+from frame_context import context_for
+from line_fit import fit_line
+from motion_gate import MotionGate
+from parking_lanes import ParkingLaneTracker
+from sign_schedule import SignScheduler
+from sign_tracker import SignTracker
+from unchanged_view import UnchangedView
+
+def to_full(coords, scale):
+    """Pixel coordinates found at `scale` (see FrameContext.at), in the full
+    resolution view."""
+    if scale == 1:
+        return coords
+    if isinstance(coords, np.ndarray):
+        return np.round(coords / scale).astype(int)
+    return tuple(int(round(v / scale)) for v in coords)
+
+color_dist = {
+            'Red': {'Lower': np.array([175,50,20]), 'Upper': np.array([180, 255, 255])},
+            'Yellow': {'Lower': np.array([23,41,133]), 'Upper': np.array([40,255,255])},
+            'Green': {'Lower': np.array([35, 43, 35]), 'Upper': np.array([90, 255, 255])},
+              }
+# colour lookup tables of traffic_light.classify, built once
+_light_luts = traffic_light.channel_luts(color_dist)
+
+class LaneStage:
+    """Follows the yellow line in view1.
+
+    Only rows top..bottom are used, and below `bottom` only the first
+    `left_columns` columns. Just those bands are converted and thresholded,
+    and their moments are combined into the ones of the whole masked view.
+    """
+    def __init__(self, top=40, bottom=60, left_columns=20):
+        self.top = top
+        self.bottom = bottom
+        self.left_columns = left_columns
+
+    def bands(self, h, w, id_num):
+        """(y_start, y_end, x_end) of every band that is looked at, all
+        starting at column 0."""
+        right = w
+        if id_num == 35 or id_num == 34:
+            right = 128                     # hide right yellow line
+        return ((self.top, min(self.bottom, h), right),
+                (self.bottom, h, min(self.left_columns, right)))
+
+    @timing.timed('detect_yellow_line')
+    def detect(self, view, car, ctx=None):
+        """(True, moments) of the yellow pixels in the bands, or
+        (False, None) if the yellow path ended."""
+        ctx = context_for(view, ctx)
+        h, w, d = view.shape #h=120, w=160, d=3
+
+        M = {'m00': 0.0, 'm10': 0.0, 'm01': 0.0}
+        for y_start, y_end, x_end in self.bands(h, w, car.id_num):
+            if y_end <= y_start or x_end <= 0:
+                continue
+            hsv = ctx.hsv_region(y_start, y_end, 0, x_end)
+            band = cv2.inRange(hsv, color_dist['Yellow']['Lower'], color_dist['Yellow']['Upper']) #binarize yellow color
+            m = cv2.moments(band, binaryImage=True)
+            M['m00'] += m['m00']
+            M['m10'] += m['m10']
+            M['m01'] += m['m01'] + y_start * m['m00']
+
+        if M['m00'] > 0:
+            return True, M
+        else:
+            return False, None ##if yellow path end
+
+    @timing.timed('follow_lane')
+    def follow(self, view, M, car):
+        h, w, d = view.shape #h=120, w=160
+        cx = int(M['m10']/M['m00'])
+        cx = int((108) / 2 + cx)
+        cy = int(M['m01']/M['m00'])
+        cv2.circle(view, (cx, cy), 4, (0,0,255), -1)
+        imwrite(str(car.state) + '-dot.jpg', view)
+
+        err = cx - w/2
+        log.event(event_log.ERR, err)
+
+        if abs(err) < 20:
+            kp = 0.02
+        else:
+            kp = 0.01
+
+        if car.current_speed < 0.5:
+            car.current_speed = 0.5
+
+        if err == 0:
+            return straight_fn(car, car.current_speed)
+        elif err > 0:
+            # turn right
+            left_speed = 1*car.current_speed
+            lr_ratio=(50-abs(err))*kp
+            return turn_right_fn(car, left_speed, lr_ratio) #right_speed=0.01
+        elif err < 0:
+            # turn left
+            right_speed = 1*car.current_speed
+            lr_ratio=(50-abs(err))*kp
+            return turn_left_fn(car, right_speed, lr_ratio) #left_speed=0.01
+
+class SignStage:
+    """Finds traffic signs in view2 and classifies them with the SVM.
+
+    sign_classes = {14: 'Stop', 33: 'Turn right', 34: 'Turn left', 35: 'Straight'}
+
+    The detector runs on view2 resized by `scale`, the SVM on the sign cut
+    from the full view. Signs whose right edge is past `max_x` of the
+    width are not classified. `ran` tells whether the last recognise()
+    call ran the detector or the scheduler skipped it.
+    """
+    def __init__(self, search_every=2, locked_every=5, margin=1.0, max_misses=3,
+                 scale=1.0, max_x=600/640):
+        model_cache.warmup()
+        self.scale = scale
+        self.max_x = max_x
+        # searches near the last sign before falling back to the whole view
+        self.tracker = SignTracker(margin=margin, max_misses=max_misses,
+                                   min_size=(int(120 * scale), int(120 * scale)))
+        # sign recognition cadence, see SignScheduler
+        self.scheduler = SignScheduler(search_every=search_every, locked_every=locked_every)
+        # lane state of the previous frame, see Mission.lane_frame
+        self.has_yellow = False
+        self.ran = False
+
+    def recognise(self, view2, car, has_yellow, ctx=None):
+        """The sign id, car.id_num when no new sign was classified. The
+        caller stores it in car.id_num: the lane stage may be reading that
+        concurrently, see Mission.lane_frame."""
+        id_num = car.id_num
+        log.event(event_log.SIGN_ID, id_num)
+        self.ran = self.scheduler.should_run(has_yellow, id_num)
+        if self.ran:
+            svm = model_cache.get_svm()
+            detector = model_cache.get_detector()
+            im = view2
+            with timing.stage('detector.ensemble'):
+                rect = self.tracker.detect(detector, context_for(im, ctx).at(self.scale).view)
+            if rect:
+                xmin, ymin, xmax, ymax = to_full(tuple(rect), self.scale)
+                roi = im[ymin:ymax, xmin:xmax, :]
+                imwrite(str(car.state) + '-roi.jpg', roi)
+                if xmax < self.max_x * im.shape[1]:
+                    with timing.stage('svm.predict'):
+                        id_num = svm.predict(roi, "hog")
+        return id_num
+
+class TrafficLightStage:
+    """Waits at a junction until the light turns green.
+
+    color_id: 0=red, 1=yellow, 2=green, 3=has_check_light
+
+    The lights are looked for in view2 resized by `scale`.
+    """
+    def __init__(self, scale=1.0, min_width=10):
+        self.scale = scale
+        self.min_width = min_width
+
+    @timing.timed('detect_traffic_light')
+    def detect(self, view2, car, ctx=None):
+        ctx = context_for(view2, ctx).at(self.scale)
+        light = traffic_light.classify(ctx.view, color_dist, ctx, self.min_width * self.scale,
+                                       _light_luts)
+        if light is not None:
+            id, area, rect = light
+            x, y, w, h = to_full(rect, self.scale)
+            copy = view2.copy()
+            cv2.rectangle(copy, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            imwrite(str(car.state) + '-tl.jpg', copy)
+            log.event(event_log.LIGHT, car.state, list(color_dist)[id])
+            car.color_id = id
+            return id
+
+    def may_go(self, view2, car, ctx=None):
+        color_id = car.color_id
+        if color_id != 3:
+            color_id = self.detect(view2, car, ctx)
+
+        if color_id == 2 or color_id == 3:
+            car.color_id = 3
+            return True
+        return False
+
+class PedestrianStage:
+    """Stops for pedestrians with a HOG detector over a window of view2.
+
+    The options are the detection profile: crop, HOG stride, padding,
+    pyramid scale and nlevels, which caps the depth of the pyramid, with a
+    coarser stride and scale for frames short of time; and the MotionGate
+    settings that skip the HOG while the crop is unchanged.
+    """
+    def __init__(self, model='./services/myHogDector.bin',
+                 x_start=160, x_end=480, y_start=100, y_end=280,
+                 win_stride=(4, 4), padding=(8, 8), scale=1.05, nlevels=64,
+                 threshold=20, min_changed=16, max_skip=5, hold_frames=10,
+                 coarse_win_stride=(8, 8), coarse_scale=1.2):
+        self.profile = {
+            'model': model,
+            'x_start': x_start, 'x_end': x_end,
+            'y_start': y_start, 'y_end': y_end,
+            'win_stride': win_stride,
+            'padding': padding,
+            'scale': scale,
+            'nlevels': nlevels,
+            # used instead when short of time, see deadline.py
+            'coarse_win_stride': coarse_win_stride,
+            'coarse_scale': coarse_scale,
+        }
+        # load the pedestrian detector once instead of reading it from disk every frame
+        model_cache.get_pedestrian_hog(model, nlevels)
+        self.gate = MotionGate(threshold=threshold, min_changed=min_changed,
+                               max_skip=max_skip, hold_frames=hold_frames)
+
+    @timing.timed('detect_pedestrain')
+    def detect(self, view2, car, coarse=False):
+        p = self.profile
+        crop = view2[p['y_start']:p['y_end'], p['x_start']:p['x_end']]
+        stopped = car.current_speed == 0
+        return self.gate.run(crop, lambda: self.run_hog(view2, car, coarse), stopped)
+
+    def run_hog(self, view2, car, coarse=False):
+        p = self.profile
+        hog = model_cache.get_pedestrian_hog(p['model'], p['nlevels'])
+        image = view2
+        x_start = p['x_start']
+        x_end = p['x_end']
+        y_start = p['y_start']
+        y_end = p['y_end']
+        imwrite(str(car.state)+"-check_pedestrian.jpg", image[y_start:y_end, x_start:x_end])
+        with timing.stage('pedestrian_hog'):
+            rects, scores = hog.detectMultiScale(image[y_start:y_end, x_start:x_end],
+                                                winStride=p['coarse_win_stride'] if coarse else p['win_stride'],
+                                                padding=p['padding'],
+                                                scale=p['coarse_scale'] if coarse else p['scale'])
+        if len(rects)>=1:
+            log.event(event_log.PEDESTRIAN)
+            image_pedestrian = view2.copy()
+            for (x, y, w, h) in rects:
+                cv2.rectangle(image_pedestrian,
+                            (x_start+int(x), y_start+int(y)),
+                            (x_start + int(x + w), y_start+int(y + h)), #(x + w, y + h)
+                            (0, 0, 255),
+                            2)
+                imwrite(str(car.state)+"-pedestrian.jpg", image_pedestrian)
+            return True
+
+        else:
+            return False
+
+class ParkingStage:
+    """Reverses into the parking space once the parking sign was seen.
+
+    parking_state{
+        0: No lane detected
+        1: Left lane detected
+        2: Left and right Lane detected
+        3: Aligned with view1 yellow line
+    }
+
+    The white lines are tracked from frame to frame, see ParkingLaneTracker.
+    They and the yellow floor behind the car are looked for in view2
+    resized by `scale`. top, right and yellow_from are fractions of view2:
+    the white lines are searched below `top` and, while none was seen, left
+    of `right`; yellow below `yellow_from`. The other sizes are full
+    resolution pixels.
+    """
+    def __init__(self, top=350/480, corridor=40, split=100, max_misses=3,
+                 min_line_pixels=30, min_line_confidence=0.5,
+                 scale=1.0, right=580/640, yellow_from=340/480):
+        self.scale = scale
+        self.right = right
+        self.yellow_from = yellow_from
+        self.lanes = ParkingLaneTracker(top=top, corridor=int(round(corridor * scale)),
+                                        split=split * scale,
+                                        threshold=max(1, int(round(60 * scale))),
+                                        max_line_gap=int(round(200 * scale)), max_misses=max_misses)
+        # the yellow line to align with, see line_fit.fit_line
+        self.min_line_pixels = min_line_pixels
+        self.min_line_confidence = min_line_confidence
+
+    def step(self, view1, view2, car, ctx1=None, ctx2=None):
+        if car.parking_state == 0 or car.parking_state == 1:
+            left_lane, right_lane = self.detect_white_line(view2, car, ctx2)
+            return self.parking(view1, view2, car, left_lane, right_lane, ctx1, ctx2)
+        else:
+            return self.parking(view1, view2, car, ctx1=ctx1, ctx2=ctx2)
+
+    def find_first_white_lane(self):
+        #looking for parking
+        left_speed = -0.5
+        right_speed = -0.8
+        log.event(event_log.FINDING_CARPARK, left_speed, right_speed)
+        return left_speed, right_speed
+
+    def find_second_white_lane(self, view2, car, left_lane):
+        #find second white lane after first lane detected
+        h, w, d = view2.shape #h=480, w=640, d=3
+
+        cx = min(w, left_lane[2]+200)
+        cy = h*0.75
+
+        cx = int(cx)
+        cy = int(cy)
+        cv2.circle(view2, (cx, cy), 4, (0,0,255), -1)
+        imwrite(str(car.state) + '-dot.jpg', view2)
+
+        err = cx - w/2
+        log.event(event_log.ERR, err)
+        kp = 0.001 #0.01
+
+        if err == 0:
+            return reverse_fn(car)
+        elif err > 0:
+            right_speed = -0.5
+            lr_ratio=(400-abs(err))*kp
+            return turn_left_fn(car, right_speed, lr_ratio) #right_speed=0.01
+        elif err < 0:
+            # turn left
+            left_speed = -0.5
+            lr_ratio=(400-abs(err))*kp
+            return turn_right_fn(car, left_speed, lr_ratio) #left_speed=0.01
+
+    @timing.timed('align_with_yellow_line')
+    def align_with_yellow_line(self, view1, car, ctx=None):
+        ctx = context_for(view1, ctx)
+        h, w, d = view1.shape #h=120, w=160, d=3
+
+        lower_yellow = np.array([23,41,133])
+        upper_yellow = np.array([40,255,255])
+        # avoid seeing the frt part of the car below row 80
+        hsv = ctx.hsv_region(0, min(80, h), 0, w)
+        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow) #binarize yellow color
+
+        slope, confidence, count = fit_line(mask_yellow)
+        if count >= self.min_line_pixels:
+            log.event(event_log.SLOPE, slope)
+
+            if confidence < self.min_line_confidence:
+                # a blob, not a line: don't steer on it
+                return reverse_fn(car)
+
+            elif slope > 0.01:
+                return turn_left_fn(car, -0.2, lr_ratio=0.5)
+
+            elif slope < -0.01:
+                return turn_right_fn(car, -0.2, lr_ratio=0.5)
+
+            else:
+                return reverse_fn(car)
+        else:
+            car.parking_state = 3
+            return stop_fn(car)
+
+    def reverse_till_no_yellow(self, view2, car, ctx=None):
+        ctx = context_for(view2, ctx).at(self.scale)
+        h, w, d = ctx.view.shape
+
+        lower_yellow = np.array([23,41,133])
+        upper_yellow = np.array([40,255,255])
+
+        # only the part behind the car
+        hsv = ctx.hsv_region(int(round(self.yellow_from * h)), h, 0, w)
+        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow) #binarize yellow color
+        imwrite(str(car.state) + '-noyello.jpg', mask_yellow)
+        cnts = cv2.findContours(mask_yellow, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+        if cnts:
+            return reverse_fn(car)
+        else:
+            return stop_fn(car)
+
+    def parking(self, view1, view2, car, left_lane=None, right_lane=None, ctx1=None, ctx2=None):
+        log.event(event_log.PARKING_STATE, car.parking_state)
+
+        if car.parking_state == 0:
+            left_speed, right_speed = self.find_first_white_lane()
+
+        elif car.parking_state == 1:
+            left_speed, right_speed = self.find_second_white_lane(view2, car, left_lane)
+
+        elif car.parking_state == 2:
+            left_speed, right_speed = self.align_with_yellow_line(view1, car, ctx1)
+
+        elif car.parking_state == 3:
+            left_speed, right_speed = self.reverse_till_no_yellow(view2, car, ctx2)
+
+        return left_speed, right_speed
+
+    @timing.timed('detect_white_line')
+    def detect_white_line(self, view, car, ctx=None):
+        ctx = context_for(view, ctx).at(self.scale)
+        lower_white = np.array([0, 0, 210])
+        upper_white = np.array([255, 30, 255])
+
+        def mask_of(y_start, y_end, x_start, x_end):
+            return cv2.inRange(ctx.hsv_region(y_start, y_end, x_start, x_end), lower_white, upper_white) #binarize white color
+
+        h, w, d = ctx.view.shape #h=480, w=640, d=3 at full resolution
+        # only the bottom part from lanes.top (350 of 480) is searched
+        right = int(round(self.right * w)) if car.parking_state == 0 else w
+        left_lane, right_lane = self.lanes.detect(mask_of, ctx.view.shape, right)
+        if left_lane is not None:
+            left_lane = to_full(left_lane, self.scale)
+        if right_lane is not None:
+            right_lane = to_full(right_lane, self.scale)
+
+        # draw Hough lines
+        if left_lane is not None:
+            car.parking_state = 1 if right_lane is None else 2
+            cv2.line(view, (left_lane[0], left_lane[1]), (left_lane[2], left_lane[3]), (0, 255, 0), 2)
+        if right_lane is not None:
+            cv2.line(view, (right_lane[0], right_lane[1]), (right_lane[2], right_lane[3]), (0, 255, 0), 2)
+
+        return left_lane, right_lane
+
+STAGES = {
+    'lane': LaneStage,
+    'sign': SignStage,
+    'traffic_light': TrafficLightStage,
+    'pedestrian': PedestrianStage,
+    'parking': ParkingStage,
+    # not a stage of its own: reuses the view2 results of the others
+    'unchanged_view': UnchangedView,
+}
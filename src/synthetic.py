@@ -0,0 +1,74 @@
+"""Synthetic view1/view2 frames with controllable content.
+
+The colours are picked to fall inside the ranges the stages threshold on
+(stages.color_dist, the white and yellow masks of the parking stage) and
+the ones offline_services.StandInDetector takes for a sign, so the frames
+drive the missions through their states without the simulator.
+
+    v1 = view1(x=26, curve=0.004)                       # bending yellow lane
+    v2 = view2(light='red', sign=(420, 120, 60))        # red light, a sign
+    v2 = view2(white_lines=[((100, 479), (180, 360))])  # parking line
+"""
+import cv2
+import numpy as np
+
+VIEW1_SHAPE = (120, 160, 3)
+VIEW2_SHAPE = (480, 640, 3)
+
+# BGR colours
+ROAD = (80, 80, 80)
+YELLOW = (0, 255, 255)
+WHITE = (255, 255, 255)
+RED = (25, 0, 255)          # hue 177, color_dist['Red'] starts at 175
+GREEN = (0, 255, 0)
+BLUE = (255, 0, 0)          # a sign to StandInDetector
+LIGHTS = {'red': RED, 'green': GREEN}
+
+def _finish(img, noise, rng):
+    if noise:
+        rng = rng or np.random.default_rng()
+        jitter = rng.normal(0, noise, img.shape)
+        img = np.clip(img + jitter, 0, 255).astype(np.uint8)
+    return img
+
+def view1(x=26, slope=0.0, curve=0.0, top=0, bottom=120, width=6, noise=0, rng=None):
+    """A view1 frame with a yellow line between rows top and bottom.
+
+    The line is at column `x` on row `bottom` and moves by `slope` columns
+    per row and `curve` columns per row squared going up. x=None gives a
+    frame without a line, where the yellow path ends.
+    """
+    img = np.full(VIEW1_SHAPE, ROAD, np.uint8)
+    if x is not None and bottom > top:
+        rise = np.arange(bottom - top, dtype=float)
+        xs = x + slope * rise + curve * rise ** 2
+        ys = bottom - 1 - rise
+        points = np.stack([xs, ys], axis=1).round().astype(np.int32)
+        cv2.polylines(img, [points], False, YELLOW, width)
+    return _finish(img, noise, rng)
+
+def view2(light=None, light_at=(300, 80), light_radius=18, sign=None,
+          white_lines=(), yellow_from=None, noise=0, rng=None):
+    """A view2 frame.
+
+    light: None, 'red' or 'green', a disc of light_radius at light_at (x, y).
+    sign: (x, y, size) of a square sign patch, top left corner at x, y.
+    white_lines: ((x0, y0), (x1, y1)) parking lines, 8 px wide.
+    yellow_from: paint yellow floor from this row to the bottom.
+    """
+    img = np.full(VIEW2_SHAPE, ROAD, np.uint8)
+    if light is not None:
+        cv2.circle(img, light_at, light_radius, LIGHTS[light], -1)
+    if sign is not None:
+        x, y, size = sign
+        cv2.rectangle(img, (x, y), (x + size, y + size), BLUE, -1)
+    for start, end in white_lines:
+        cv2.line(img, start, end, WHITE, 8)
+    if yellow_from is not None:
+        img[yellow_from:] = YELLOW
+    return _finish(img, noise, rng)
+
+def stack(frames):
+    """(views1, views2) arrays from a list of (view1, view2) pairs."""
+    views1, views2 = zip(*frames)
+    return np.stack(views1), np.stack(views2)
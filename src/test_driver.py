@@ -0,0 +1,75 @@
+"""Tests of the latest-frame-wins control loop, driven by LocalFrameSource.
+
+    cd src && python -m pytest -q test_driver.py
+"""
+import asyncio
+import time
+
+import numpy as np
+
+from driver import ControlLoop, Frame, LatestFrame, LocalFrameSource
+
+def frames(n):
+    return [(np.full((12, 16, 3), i, np.uint8), np.full((48, 64, 3), i, np.uint8))
+            for i in range(n)]
+
+def test_latest_frame_replaces_an_untaken_frame():
+    async def main():
+        mailbox = LatestFrame()
+        mailbox.put(Frame(0, 0.0, None, None))
+        mailbox.put(Frame(1, 0.0, None, None))
+        first = await mailbox.get()
+        mailbox.put(Frame(2, 0.0, None, None))
+        mailbox.close()
+        return mailbox, first, await mailbox.get(), await mailbox.get()
+
+    mailbox, first, last, end = asyncio.run(main())
+    assert first.index == 1
+    assert last.index == 2
+    assert end is None
+    assert (mailbox.received, mailbox.dropped) == (3, 1)
+
+def test_get_waits_for_a_frame_or_close():
+    async def main():
+        mailbox = LatestFrame()
+        waiting = asyncio.ensure_future(mailbox.get())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        mailbox.put(Frame(0, 0.0, None, None))
+        frame = await waiting
+        closed = asyncio.ensure_future(mailbox.get())
+        await asyncio.sleep(0)
+        mailbox.close()
+        return frame, await closed
+
+    frame, closed = asyncio.run(main())
+    assert frame.index == 0
+    assert closed is None
+
+def test_slow_perception_drops_stale_frames():
+    seen = []
+
+    def image_to_speed(view1, view2, state):
+        seen.append(int(view1[0, 0, 0]))
+        time.sleep(0.02)
+        return 0.5, 0.5
+
+    published = []
+    control = ControlLoop(image_to_speed, lambda frame, speeds: published.append(frame.index))
+    try:
+        asyncio.run(control.run(LocalFrameSource(frames(30), fps=500)))
+    finally:
+        control.close()
+
+    s = control.stats()
+    indices = [index for index, speeds in control.commands]
+    assert s['received'] == 30
+    assert s['dropped'] > 0
+    assert s['processed'] + s['dropped'] == 30
+    assert indices == sorted(set(indices))
+    # the newest frame is never dropped
+    assert indices[-1] == 29
+    assert seen == indices == published
+    assert len(control.ages) == s['processed']
+    assert all(age >= 0.02 for age in control.ages)
+    assert s['age_max'] >= s['age_p50'] > 0
@@ -0,0 +1,30 @@
+"""Tests of MotionGate on the pedestrian crop.
+
+    cd src && python -m pytest -q test_motion_gate.py
+"""
+import numpy as np
+
+from motion_gate import MotionGate
+
+def crops(n, seed=0):
+    """n frames of a still 320x180 crop with sensor noise."""
+    rng = np.random.default_rng(seed)
+    scene = rng.integers(90, 160, (180, 320, 3), dtype=np.uint8)
+    noise = rng.integers(-3, 4, (n, 180, 320, 3))
+    return [np.clip(scene + d, 0, 255).astype(np.uint8) for d in noise]
+
+def runs(gate, frames):
+    ran = []
+    for i, crop in enumerate(frames):
+        gate.run(crop, lambda: ran.append(i))
+    return ran
+
+def test_still_crop_runs_at_the_max_skip_cadence():
+    assert runs(MotionGate(max_skip=5), crops(11)) == [0, 5, 10]
+
+def test_pedestrian_entering_the_crop_is_a_change():
+    frames = crops(11)
+    for crop in frames[2:]:
+        # a 30x100 px figure walks in from the left
+        crop[60:160, 20:50] = (40, 30, 30)
+    assert runs(MotionGate(max_skip=5), frames) == [0, 2, 7]
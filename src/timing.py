@@ -0,0 +1,86 @@
+"""Per-stage latency histograms for the perception and control stages.
+
+Wrap a stage function with @timed('name') or a call with
+`with stage('name'):`. While config['enabled'] is False both add only a
+flag check. The last config['window'] samples of each stage are kept and
+summarised as p50/p95/p99 by report() and dump().
+"""
+import atexit
+import collections
+import contextlib
+import functools
+import sys
+import time
+
+import numpy as np
+
+config = {
+            'enabled': False,
+            'window': 1000,
+            'dump_at_exit': True,
+              }
+_samples = {}
+_nothing = contextlib.nullcontext()
+
+def record(name, seconds):
+    if name not in _samples:
+        _samples[name] = collections.deque(maxlen=config['window'])
+    _samples[name].append(seconds)
+
+@contextlib.contextmanager
+def _timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def stage(name):
+    if not config['enabled']:
+        return _nothing
+    return _timer(name)
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not config['enabled']:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def report():
+    """{stage: {'count', 'p50', 'p95', 'p99', 'max'}}, times in milliseconds."""
+    result = {}
+    for name, samples in _samples.items():
+        if not samples:
+            continue
+        ms = np.fromiter(samples, float) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        result[name] = {'count': len(ms), 'p50': p50, 'p95': p95, 'p99': p99, 'max': ms.max()}
+    return result
+
+def dump(file=None):
+    file = file or sys.stderr
+    stats = report()
+    if not stats:
+        return
+    file.write('%-24s %7s %9s %9s %9s %9s\n' % ('stage', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for name in sorted(stats):
+        s = stats[name]
+        file.write('%-24s %7d %9.3f %9.3f %9.3f %9.3f\n'
+                   % (name, s['count'], s['p50'], s['p95'], s['p99'], s['max']))
+
+def reset():
+    _samples.clear()
+
+def _dump_at_exit():
+    if config['enabled'] and config['dump_at_exit']:
+        dump()
+
+atexit.register(_dump_at_exit)
@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+
+from frame_context import context_for
+
+# part of view2 where the lights are expected, (y_start, y_end, x_start, x_end)
+# as fractions of the view, rows 0-200 and columns 150-450 of 480x640
+region = (0, 200/480, 150/640, 450/640)
+kernel = np.ones((3, 3), np.uint8)
+
+def region_bounds(h, w):
+    """`region` in pixels of an h x w view."""
+    y0, y1 = (int(round(f * h)) for f in region[:2])
+    x0, x1 = (int(round(f * w)) for f in region[2:])
+    return y0, y1, x0, x1
+
+def channel_luts(colors):
+    """One 256 entry table per HSV channel, bit i set where colour i's range
+    admits the value. ANDing the three lookups labels a pixel with every
+    colour it belongs to."""
+    luts = np.zeros((3, 256), np.uint8)
+    values = np.arange(256)
+    for i, color in enumerate(colors.values()):
+        for c in range(3):
+            inside = (values >= color['Lower'][c]) & (values <= color['Upper'][c])
+            luts[c, inside] |= 1 << i
+    return luts
+
+def classify(view2, colors, ctx=None, min_width=10, luts=None):
+    """Find the traffic light in one pass over `region`.
+
+    Every pixel of the region is labelled with all of `colors` at once, the
+    union is opened and split into connected components, and each component
+    takes the colour most of its pixels have (the earlier colour on ties).
+    As when every colour was checked on its own, the first colour in
+    `colors` order with a component wider than min_width wins, so a red
+    light is not outvoted by a larger green blob.
+
+    Returns (color_id, area, (x, y, w, h)) of the largest such component of
+    that colour, in coordinates of the whole view2, or None when there is
+    none. view2 may be a reduced copy, see FrameContext.at.
+    color_id is the colour's index in `colors`; `luts` are its
+    channel_luts(colors), built on every call when not given.
+    """
+    y0, y1, x0, x1 = region_bounds(*view2.shape[:2])
+    hsv = context_for(view2, ctx).hsv_region(y0, y1, x0, x1)
+
+    if luts is None:
+        luts = channel_luts(colors)
+    bits = luts[0][hsv[:, :, 0]] & luts[1][hsv[:, :, 1]] & luts[2][hsv[:, :, 2]]
+
+    lit = cv2.morphologyEx((bits > 0).astype(np.uint8), cv2.MORPH_OPEN, kernel)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(lit, connectivity=8)
+    if n < 2:
+        return None
+
+    wide = np.flatnonzero(stats[1:, cv2.CC_STAT_WIDTH] > min_width) + 1
+    if wide.size == 0:
+        return None
+
+    # pixels of every colour in each component, the majority colour wins
+    counts = np.stack([np.bincount(labels[(bits & (1 << i)) > 0], minlength=n)
+                       for i in range(len(colors))])
+    color_of = counts[:, wide].argmax(axis=0)
+    color_id = int(color_of.min())
+    candidates = wide[color_of == color_id]
+    best = candidates[np.argmax(stats[candidates, cv2.CC_STAT_AREA])]
+
+    x, y, w, h, area = stats[best]
+    return color_id, int(area), (int(x) + x0, int(y) + y0, int(w), int(h))
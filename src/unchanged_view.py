@@ -0,0 +1,94 @@
+import cv2
+
+from frame_context import context_for
+import traffic_light
+
+class UnchangedView:
+    """Reuses the view2 perception results while view2 does not change.
+
+    The fingerprint of a frame is view2 shrunk by `scale` to grey, plus the
+    traffic light region at `light_scale`, the scale the traffic light
+    stage looks at (None leaves it out): a light just wide enough for the
+    detector can vanish at `scale`. A frame is unchanged when in each of
+    them at most `max_changed` pixels differ by more than `threshold` from
+    the fingerprint the cached results were computed on. A count rather
+    than a mean, so a light switching colour is a change even though it
+    covers a tiny part of the view.
+    The results are recomputed at least every `refresh_every` frames. With
+    `only_stopped` frames are only fingerprinted while the car stands
+    still, when the view can stay the same, so driving costs nothing.
+    """
+    def __init__(self, threshold=12, max_changed=2, scale=0.125, refresh_every=15,
+                 only_stopped=True, light_scale=0.5):
+        self.threshold = threshold
+        self.max_changed = max_changed
+        self.scale = scale
+        self.refresh_every = refresh_every
+        self.only_stopped = only_stopped
+        self.light_scale = light_scale
+        self.reference = None
+        self.results = {}
+        self.unchanged = False
+        self.age = 0
+        self.stats = {'frames': 0, 'unchanged': 0, 'changed': 0, 'refreshed': 0,
+                      'hits': 0, 'misses': 0}
+
+    def fingerprint(self, view, ctx=None):
+        """Grey images to compare, all cut from levels of the frame's view2
+        pyramid, shared with the stages."""
+        ctx = context_for(view, ctx)
+        prints = [cv2.cvtColor(ctx.at(self.scale).view, cv2.COLOR_BGR2GRAY)]
+        if self.light_scale is not None:
+            level = ctx.at(self.light_scale).view
+            y0, y1, x0, x1 = traffic_light.region_bounds(*level.shape[:2])
+            prints.append(cv2.cvtColor(level[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY))
+        return prints
+
+    def changed_pixels(self, small, reference):
+        diff = cv2.absdiff(small, reference)
+        return cv2.countNonZero(cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)[1])
+
+    def same(self, prints):
+        return self.reference is not None and all(
+            small.shape == reference.shape and self.changed_pixels(small, reference) <= self.max_changed
+            for small, reference in zip(prints, self.reference))
+
+    def start(self, view2, stopped, ctx=None):
+        """Fingerprint the frame's view2 and drop the cached results if it
+        changed."""
+        self.stats['frames'] += 1
+        self.unchanged = False
+        if view2 is None or (self.only_stopped and not stopped):
+            self.reference = None
+            self.results.clear()
+            return
+
+        prints = self.fingerprint(view2, ctx)
+        if self.same(prints):
+            self.age += 1
+            if self.age < self.refresh_every:
+                self.unchanged = True
+                self.stats['unchanged'] += 1
+                return
+            self.stats['refreshed'] += 1
+        else:
+            self.stats['changed'] += 1
+        self.reference = prints
+        self.age = 0
+        self.results.clear()
+
+    def get(self, name, compute):
+        """The result `name` had on the cached frame while view2 is unchanged,
+        otherwise compute() cached for the next frames."""
+        if self.unchanged and name in self.results:
+            self.stats['hits'] += 1
+            return self.results[name]
+        self.stats['misses'] += 1
+        result = self.results[name] = compute()
+        return result
+
+    def reset(self):
+        self.reference = None
+        self.results.clear()
+        self.unchanged = False
+        self.age = 0